@@ -1,9 +1,11 @@
 import os
 import asyncio
+import concurrent.futures
 import subprocess
 import shutil
+import tarfile
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from datetime import datetime
 import logging
 from tqdm.asyncio import tqdm
@@ -12,17 +14,72 @@ from utils import save_json, load_json
 
 logger = logging.getLogger(__name__)
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def _skip_symlinks(tarinfo):
+    """tarfile filter dropping symlinks/hardlinks from the archive."""
+    if tarinfo.issym() or tarinfo.islnk():
+        logger.warning(f"Skipping symlink: {tarinfo.name}")
+        return None
+    return tarinfo
+
+def _optimize_image_worker(filepath: str, image_quality: int, max_image_width: int) -> int:
+    """Optimize one image inside a pool worker process.
+
+    PIL holds the GIL through most of decode/resize/encode, so a thread
+    pool serializes image work; a process pool actually uses the cores.
+    Settings travel as plain args because bound methods don't pickle.
+    """
+    return ContentOptimizer(image_quality, max_image_width).optimize_image(filepath)
+
+# Suffix -> optimizer kind for the dispatch loop; one dict probe per file
+# replaces the if/elif ladder of list-membership tests. SVGs stay special:
+# they batch into a single SVGO invocation.
+_EXT_TO_OPT = {
+    '.html': 'html', '.htm': 'html',
+    '.css': 'css',
+    '.js': 'js', '.json': 'js',
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image',
+    '.gif': 'image', '.bmp': 'image',
+}
+
+def _scan(root: str):
+    """Yield (filepath, size, lowercase extension) for every file under root.
+
+    One recursive scandir pass: DirEntry reuses the stat data from the
+    directory read, unlike an os.walk plus per-file getsize double pass.
+    """
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            yield from _scan(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry.path, entry.stat().st_size, os.path.splitext(entry.name)[1].lower()
+
 class WebCompressor:
     def __init__(self, source_dir: str, archive_dir: str, compression_level: int = 19):
         self.source_dir = source_dir
         self.archive_dir = archive_dir
         self.compression_level = compression_level
         self.optimizer = ContentOptimizer()
-        
+        self._scan_cache: List = []  # (path, size, ext) from the last scan
+        # Dedicated pool for image re-encoding; the minifiers have their own
+        self._proc_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count())
+        # Resolved once; each create_archive call used to fork `which zstd`
+        self._zstd_path = shutil.which('zstd')
+
         Path(archive_dir).mkdir(parents=True, exist_ok=True)
     
-    async def optimize_directory(self, directory: str) -> Dict[str, int]:
-        """Optimize all files in directory"""
+    async def optimize_directory(self, directory: str) -> Tuple[Dict[str, int], int]:
+        """Optimize all files in directory.
+
+        Returns the per-type savings stats together with the total
+        pre-optimization byte count, summed from the scan pass so callers
+        never need to re-stat the tree.
+        """
         stats = {
             'html_saved': 0,
             'css_saved': 0,
@@ -32,94 +89,113 @@ class WebCompressor:
             'total_saved': 0
         }
         
-        # Get all files
-        files_to_optimize = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                filepath = os.path.join(root, file)
-                files_to_optimize.append(filepath)
-        
+        # One traversal collects paths, sizes, and extensions; the cached
+        # entries double as the original-size sum in compress()
+        self._scan_cache = list(_scan(directory))
+
+        # Gathering one coroutine per file is fine for scheduling, but
+        # letting them all open files/submit executor jobs at once is not;
+        # a semaphore keeps only a few times cpu_count in flight.
+        sem = asyncio.Semaphore((os.cpu_count() or 2) * 4)
+
         # Process files with progress bar
-        with tqdm(total=len(files_to_optimize), desc="Optimizing files") as pbar:
+        with tqdm(total=len(self._scan_cache), desc="Optimizing files") as pbar:
             tasks = []
-            
-            for filepath in files_to_optimize:
-                ext = Path(filepath).suffix.lower()
-                
-                if ext in ['.html', '.htm']:
-                    task = self.optimize_file(filepath, 'html', stats, pbar)
-                elif ext == '.css':
-                    task = self.optimize_file(filepath, 'css', stats, pbar)
-                elif ext in ['.js', '.json']:
-                    task = self.optimize_file(filepath, 'js', stats, pbar)
-                elif ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-                    task = self.optimize_file(filepath, 'image', stats, pbar)
+            svg_files = []
+
+            for filepath, _, ext in self._scan_cache:
+                kind = _EXT_TO_OPT.get(ext)
+                if kind is not None:
+                    tasks.append(self.optimize_file(filepath, kind, stats, pbar, sem))
                 elif ext == '.svg':
-                    task = self.optimize_file(filepath, 'svg', stats, pbar)
+                    # SVGs are handled in one batched SVGO invocation below
+                    svg_files.append(filepath)
                 else:
                     pbar.update(1)
-                    continue
-                
-                tasks.append(task)
-            
+
             # Run optimization tasks concurrently
             await asyncio.gather(*tasks)
+
+            if svg_files:
+                stats['svg_saved'] += await self.optimizer.optimize_svgs(svg_files)
+                pbar.update(len(svg_files))
         
         stats['total_saved'] = sum(v for k, v in stats.items() if k != 'total_saved')
-        return stats
+        return stats, sum(size for _, size, _ in self._scan_cache)
     
-    async def optimize_file(self, filepath: str, file_type: str, stats: Dict, pbar: tqdm):
+    async def optimize_file(self, filepath: str, file_type: str, stats: Dict, pbar: tqdm,
+                            sem: asyncio.Semaphore):
         """Optimize a single file"""
         saved = 0
-        
+
         try:
-            if file_type == 'html':
-                saved = await self.optimizer.optimize_html(filepath)
-                stats['html_saved'] += saved
-            elif file_type == 'css':
-                saved = await self.optimizer.optimize_css(filepath)
-                stats['css_saved'] += saved
-            elif file_type == 'js':
-                saved = await self.optimizer.optimize_js(filepath)
-                stats['js_saved'] += saved
-            elif file_type == 'image':
-                saved = await asyncio.get_event_loop().run_in_executor(
-                    None, self.optimizer.optimize_image, filepath
-                )
-                stats['image_saved'] += saved
-            elif file_type == 'svg':
-                saved = await self.optimizer.optimize_svg(filepath)
-                stats['svg_saved'] += saved
+            async with sem:
+                if file_type == 'html':
+                    saved = await self.optimizer.optimize_html(filepath)
+                    stats['html_saved'] += saved
+                elif file_type == 'css':
+                    saved = await self.optimizer.optimize_css(filepath)
+                    stats['css_saved'] += saved
+                elif file_type == 'js':
+                    saved = await self.optimizer.optimize_js(filepath)
+                    stats['js_saved'] += saved
+                elif file_type == 'image':
+                    saved = await asyncio.get_event_loop().run_in_executor(
+                        self._proc_pool, _optimize_image_worker, filepath,
+                        self.optimizer.image_quality, self.optimizer.max_image_width
+                    )
+                    stats['image_saved'] += saved
+                elif file_type == 'svg':
+                    saved = await self.optimizer.optimize_svg(filepath)
+                    stats['svg_saved'] += saved
         except Exception as e:
             logger.error(f"Error optimizing {filepath}: {e}")
-        
+
         pbar.update(1)
     
-    async def create_archive(self, optimized_dir: str) -> str:
+    def _write_zst_archive(self, archive_path: str, optimized_dir: str):
+        """Stream a .tar.zst through the zstandard binding.
+
+        threads=-1 spreads compression over all cores, which the
+        tar --use-compress-program subprocess route cannot exploit.
+        """
+        cctx = zstandard.ZstdCompressor(level=self.compression_level, threads=-1)
+        with open(archive_path, 'wb') as fh:
+            with cctx.stream_writer(fh) as compressor:
+                with tarfile.open(fileobj=compressor, mode='w|') as tar:
+                    tar.add(optimized_dir, arcname='.', filter=_skip_symlinks)
+
+    async def create_archive(self, optimized_dir: str, now: datetime = None) -> str:
         """Create compressed archive using Zstandard"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if now is None:
+            now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
         archive_name = f"web_archive_{timestamp}.tar.zst"
         archive_path = os.path.join(self.archive_dir, archive_name)
-        
+
         logger.info(f"Creating archive: {archive_path}")
-        
+
+        if zstandard is not None:
+            try:
+                # In-process multi-threaded zstd: no fork and no dependency
+                # on a system zstd binary
+                await asyncio.to_thread(self._write_zst_archive, archive_path, optimized_dir)
+
+                archive_size = os.path.getsize(archive_path)
+                logger.info(f"Archive created successfully: {archive_path} ({archive_size:,} bytes)")
+                return archive_path
+            except Exception as e:
+                logger.error(f"Error creating zstd archive: {e}")
+
         try:
-            # Check if zstd is available
-            zstd_check = await asyncio.create_subprocess_exec(
-                'which', 'zstd',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await zstd_check.communicate()
-            
-            if zstd_check.returncode == 0:
+            if self._zstd_path is not None:
                 # Use zstd with tar in a single command
                 logger.info("Using zstd compression...")
                 
                 # Create tar archive with zstd compression directly
                 compress_process = await asyncio.create_subprocess_exec(
                     'tar',
-                    '--use-compress-program=zstd -' + str(self.compression_level),
+                    f'--use-compress-program={self._zstd_path} -{self.compression_level}',
                     '-cf', archive_path,
                     '-C', optimized_dir,
                     '.',
@@ -168,9 +244,6 @@ class WebCompressor:
             # Try Python's built-in compression as last resort
             logger.info("Falling back to Python's built-in compression...")
             try:
-                import tarfile
-                import gzip
-                
                 archive_name = f"web_archive_{timestamp}.tar.gz"
                 archive_path = os.path.join(self.archive_dir, archive_name)
                 
@@ -196,29 +269,29 @@ class WebCompressor:
     async def compress(self) -> Dict:
         """Main compression workflow"""
         logger.info("Starting compression workflow")
-        
+
+        # One wall-clock read for the whole workflow; the archive name and
+        # the report timestamp come from the same instant
+        now = datetime.now()
+
         # Step 1: Optimize all files
         logger.info("Step 1: Optimizing files...")
-        optimization_stats = await self.optimize_directory(self.source_dir)
+        optimization_stats, original_size = await self.optimize_directory(self.source_dir)
         
         logger.info(f"Optimization complete. Total saved: {optimization_stats['total_saved']:,} bytes")
         
         # Step 2: Create compressed archive
         logger.info("Step 2: Creating compressed archive...")
-        archive_path = await self.create_archive(self.source_dir)
+        archive_path = await self.create_archive(self.source_dir, now)
         
-        # Calculate compression ratio
-        original_size = sum(
-            os.path.getsize(os.path.join(root, file))
-            for root, _, files in os.walk(self.source_dir)
-            for file in files
-        )
+        # Compression ratio uses the size sum from the optimization scan
+        # instead of re-walking the tree
         compressed_size = os.path.getsize(archive_path)
         compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
         
         # Save compression report
         report = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'source_directory': self.source_dir,
             'archive_path': archive_path,
             'optimization_stats': optimization_stats,
@@ -228,7 +301,7 @@ class WebCompressor:
         }
         
         report_path = os.path.join(self.archive_dir, 'compression_report.json')
-        save_json(report, report_path)
+        await asyncio.to_thread(save_json, report, report_path)
         
         logger.info(f"Compression complete. Ratio: {compression_ratio:.2f}%")
         
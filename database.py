@@ -1,8 +1,11 @@
 
 import os
+import time
+import threading
+import contextlib
 import psycopg2
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor, Json
+from psycopg2.extras import RealDictCursor, Json, execute_values, execute_batch
 import logging
 from dotenv import load_dotenv
 
@@ -11,23 +14,82 @@ logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool sizing is env-tuned; when fronted by PgBouncer in session mode,
+# DB_POOL_MAX should stay within the server's max_connections budget.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 5))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 25))
+DB_IDLE_TIMEOUT = float(os.getenv("DB_IDLE_TIMEOUT", 300))
+
 db_pool = None
 
+class IdleReapingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that closes connections left idle too long.
+
+    Keeps minconn connections warm for the dashboard's bursty traffic while
+    releasing the rest back to the server once things go quiet.
+    """
+
+    def __init__(self, minconn, maxconn, idle_timeout=DB_IDLE_TIMEOUT, **kwargs):
+        super().__init__(minconn, maxconn, **kwargs)
+        self.idle_timeout = idle_timeout
+        self._idle_since = {}
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+
+    def getconn(self, key=None):
+        conn = super().getconn(key)
+        self._idle_since.pop(id(conn), None)
+        return conn
+
+    def putconn(self, conn, key=None, close=False):
+        self._idle_since[id(conn)] = time.monotonic()
+        super().putconn(conn, key, close)
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 60))
+            now = time.monotonic()
+            with self._lock:
+                if self.closed:
+                    return
+                available = len(self._pool)
+                for conn in list(self._pool):
+                    if available <= self.minconn:
+                        break
+                    idle = now - self._idle_since.get(id(conn), now)
+                    if idle > self.idle_timeout:
+                        self._pool.remove(conn)
+                        self._idle_since.pop(id(conn), None)
+                        try:
+                            conn.close()
+                        except Exception:
+                            pass
+                        available -= 1
+
 def init_db_pool():
     """Initializes the database connection pool."""
     global db_pool
     if db_pool is None:
         try:
-            db_pool = psycopg2.pool.SimpleConnectionPool(1, 10, dsn=DATABASE_URL)
+            db_pool = IdleReapingConnectionPool(
+                DB_POOL_MIN, DB_POOL_MAX, dsn=DATABASE_URL
+            )
         except psycopg2.OperationalError as e:
             logger.error(f"Could not connect to the database: {e}", exc_info=True)
             raise
 
-def get_db_connection():
-    """Gets a connection from the pool."""
+def get_db_connection(timeout=5.0):
+    """Gets a connection from the pool, retrying briefly if it is exhausted."""
     if db_pool is None:
         init_db_pool()
-    return db_pool.getconn()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return db_pool.getconn()
+        except psycopg2.pool.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
 
 def release_db_connection(conn):
     """Releases a connection back to the pool."""
@@ -39,6 +101,29 @@ def close_db_pool():
     if db_pool:
         db_pool.closeall()
 
+@contextlib.contextmanager
+def db_cursor(dict_cursor=False, commit=True):
+    """Yields a cursor on a pooled connection, committing on clean exit.
+
+    Scopes the acquire/commit/release boilerplate to one place so helpers
+    can hold a single connection for their whole unit of work.
+    """
+    conn = get_db_connection()
+    cur = None
+    try:
+        cur = conn.cursor(cursor_factory=RealDictCursor if dict_cursor else None)
+        yield cur
+        if commit:
+            conn.commit()
+    finally:
+        if cur is not None:
+            cur.close()
+        release_db_connection(conn)
+
+# Whether the pages(run_id, url) unique index exists, so page writers can
+# use ON CONFLICT; cleared by setup_database() when the index can't be built.
+_pages_conflict_safe = True
+
 def setup_database():
     """Creates the necessary tables in the database if they don't already exist."""
     commands = (
@@ -65,146 +150,274 @@ def setup_database():
             domain TEXT,
             FOREIGN KEY (run_id) REFERENCES runs (id) ON DELETE CASCADE
         );
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS pages_run_ts_id ON pages(run_id, timestamp DESC, id DESC);
+        """,
+        # pages_run_ts is a leftover prefix of pages_run_ts_id; drop it on
+        # databases that still carry it.
+        """
+        DROP INDEX IF EXISTS pages_run_ts;
+        """,
+        # jsonb_path_ops is smaller/faster than the default opclass for @>
+        # containment queries; filters must use @> (not ->) to hit these.
+        """
+        CREATE INDEX IF NOT EXISTS runs_stats_gin
+            ON runs USING GIN (stats jsonb_path_ops);
+        """,
+        # domain_counts is filtered with the key-existence operator (?),
+        # which jsonb_path_ops cannot serve, so this index keeps the
+        # default opclass; the old path_ops one is dropped on upgrade.
+        """
+        DROP INDEX IF EXISTS runs_domain_counts_gin;
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS runs_domain_counts_key_gin
+            ON runs USING GIN (domain_counts);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS pages_run_domain ON pages(run_id, domain);
+        """
+    )
+    # The unique index backing ON CONFLICT (run_id, url) gets its own
+    # transaction: on a database that predates it, duplicate rows make the
+    # CREATE fail, and bundling it with the DDL above would roll all of it
+    # back. Duplicates are cleaned up first (keeping the earliest row), and
+    # if the index still can't be built the writers fall back to plain
+    # INSERTs.
+    uniq_commands = (
+        """
+        DELETE FROM pages a USING pages b
+            WHERE a.run_id = b.run_id AND a.url = b.url AND a.id > b.id;
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS pages_run_url_uniq ON pages(run_id, url);
         """
     )
-    conn = None
+    # Trigram index accelerating the ILIKE '%...%' search path; the extension
+    # needs superuser, so failure here is non-fatal.
+    trgm_commands = (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        """
+        CREATE INDEX IF NOT EXISTS pages_url_trgm
+            ON pages USING GIN (url gin_trgm_ops);
+        """
+    )
+    global _pages_conflict_safe
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        for command in commands:
-            cur.execute(command)
-        cur.close()
-        conn.commit()
+        with db_cursor() as cur:
+            for command in commands:
+                cur.execute(command)
+        try:
+            with db_cursor() as cur:
+                for command in uniq_commands:
+                    cur.execute(command)
+            _pages_conflict_safe = True
+        except (Exception, psycopg2.DatabaseError) as error:
+            _pages_conflict_safe = False
+            logger.warning(
+                f"Could not create unique page index, "
+                f"falling back to plain inserts: {error}")
+        try:
+            with db_cursor() as cur:
+                for command in trgm_commands:
+                    cur.execute(command)
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.warning(f"Could not create trigram search index: {error}")
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
 
 def create_run(start_url, status="running"):
     """Creates a new run in the database and returns the run ID."""
     sql = """INSERT INTO runs(start_url, status) VALUES(%s, %s) RETURNING id;"""
-    conn = None
-    run_id = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(sql, (start_url, status))
-        run_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
+        with db_cursor() as cur:
+            cur.execute(sql, (start_url, status))
+            return cur.fetchone()[0]
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
-    return run_id
+        return None
 
 def update_run(run_id, stats, domain_counts, status="completed"):
     """Updates a run with stats, domain_counts, and status."""
     sql = """UPDATE runs SET stats = %s, domain_counts = %s, status = %s WHERE id = %s;"""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(sql, (Json(stats), Json(domain_counts), status, run_id))
-        conn.commit()
-        cur.close()
+        with db_cursor() as cur:
+            cur.execute(sql, (Json(stats), Json(domain_counts), status, run_id))
+    except (Exception, psycopg2.DatabaseError) as error:
+        logger.error(error)
+
+def update_runs_batch(rows):
+    """Updates several runs in one round-trip.
+
+    Each row is a (stats, domain_counts, status, run_id) tuple.
+    """
+    if not rows:
+        return
+    sql = """UPDATE runs SET stats = %s, domain_counts = %s, status = %s WHERE id = %s;"""
+    try:
+        with db_cursor() as cur:
+            execute_batch(
+                cur, sql,
+                [(Json(stats), Json(domain_counts), status, run_id)
+                 for stats, domain_counts, status, run_id in rows],
+                page_size=100
+            )
+    except (Exception, psycopg2.DatabaseError) as error:
+        logger.error(error)
+
+def insert_pages_batch(run_id, rows):
+    """Inserts a batch of pages for a run in a single round-trip.
+
+    Each row is a (url, content_type, filepath, depth, size, domain) tuple.
+    """
+    if not rows:
+        return
+    sql = """INSERT INTO pages(run_id, url, content_type, filepath, depth, size, domain)
+             VALUES %s"""
+    if _pages_conflict_safe:
+        sql += " ON CONFLICT (run_id, url) DO NOTHING"
+    sql += ";"
+    try:
+        with db_cursor() as cur:
+            execute_values(
+                cur, sql,
+                [(run_id,) + tuple(row) for row in rows],
+                template="(%s, %s, %s, %s, %s, %s, %s)",
+                page_size=500
+            )
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
 
 def insert_page(run_id, url, content_type, filepath, depth, size, domain):
     """Inserts a new page into the database."""
-    sql = """INSERT INTO pages(run_id, url, content_type, filepath, depth, size, domain)
-             VALUES(%s, %s, %s, %s, %s, %s, %s);"""
-    conn = None
+    insert_pages_batch(run_id, [(url, content_type, filepath, depth, size, domain)])
+
+def get_runs_from_db(limit=None, offset=0):
+    """Retrieves runs for the list view.
+
+    Projects only the scalar stats keys the list needs instead of shipping
+    the full stats/domain_counts JSONB payloads; use get_run_details_from_db
+    for the complete record. The default is unbounded (LIMIT NULL) because
+    the dashboard lists every run; pass limit/offset to page explicitly.
+    """
+    sql = """
+        SELECT id, timestamp, start_url, status,
+               jsonb_build_object(
+                   'pages_scraped', stats->'pages_scraped',
+                   'pages_failed', stats->'pages_failed',
+                   'bytes_downloaded', stats->'bytes_downloaded',
+                   'elapsed_seconds', stats->'elapsed_seconds',
+                   'total_domains', stats->'total_domains'
+               ) AS stats
+        FROM runs ORDER BY timestamp DESC LIMIT %s OFFSET %s;
+    """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(sql, (run_id, url, content_type, filepath, depth, size, domain))
-        conn.commit()
-        cur.close()
+        with db_cursor(dict_cursor=True, commit=False) as cur:
+            cur.execute(sql, (limit, offset))
+            return cur.fetchall()
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
+        return []
 
-def get_runs_from_db():
-    """Retrieves all runs from the database."""
-    conn = None
+def get_runs_by_domain(domain):
+    """Retrieves runs whose domain_counts contain the given domain."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM runs ORDER BY timestamp DESC;")
-        runs = cur.fetchall()
-        cur.close()
-        return runs
+        with db_cursor(dict_cursor=True, commit=False) as cur:
+            cur.execute(
+                "SELECT * FROM runs WHERE domain_counts ? %s ORDER BY timestamp DESC;",
+                (domain,)
+            )
+            return cur.fetchall()
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
         return []
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
 
 def get_run_details_from_db(run_id):
     """Retrieves the details for a specific run."""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM runs WHERE id = %s;", (run_id,))
-        run = cur.fetchone()
-        cur.close()
-        return run
+        with db_cursor(dict_cursor=True, commit=False) as cur:
+            cur.execute("SELECT * FROM runs WHERE id = %s;", (run_id,))
+            return cur.fetchone()
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
         return None
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
 
-def get_run_pages_from_db(run_id, page=1, per_page=50, search=None, domain_filter=None):
-    """Retrieves pages for a specific run with pagination and filtering."""
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+# Cached COUNT(*) results per (run_id, search, domain_filter), refreshed after TTL.
+# Keys include user-supplied search strings, so the cache is purged of expired
+# entries on every insert and capped to keep arbitrary queries from growing it.
+_count_cache = {}
+_COUNT_CACHE_TTL = 30  # seconds
+_COUNT_CACHE_MAX = 256  # entries
 
-        base_query = "FROM pages WHERE run_id = %s"
-        params = [run_id]
+def _count_cache_store(cache_key, total):
+    """Stores a count, evicting expired entries and capping the cache size."""
+    now = time.monotonic()
+    expired = [key for key, (_, stored) in _count_cache.items()
+               if now - stored >= _COUNT_CACHE_TTL]
+    for key in expired:
+        del _count_cache[key]
+    if len(_count_cache) >= _COUNT_CACHE_MAX:
+        oldest = min(_count_cache, key=lambda key: _count_cache[key][1])
+        del _count_cache[oldest]
+    _count_cache[cache_key] = (total, now)
 
-        if search:
-            base_query += " AND (url ILIKE %s OR domain ILIKE %s)"
-            params.extend([f"%{search}%", f"%{search}%"])
+def get_run_pages_from_db(run_id, page=1, per_page=50, search=None, domain_filter=None,
+                          cursor=None, include_total=True):
+    """Retrieves pages for a specific run with pagination and filtering.
 
-        if domain_filter:
-            base_query += " AND domain = %s"
-            params.append(domain_filter)
+    When `cursor` is given as a (timestamp, id) tuple from the last row of the
+    previous page, keyset pagination is used instead of OFFSET, so fetching
+    deep pages stays O(page_size). The keyset path skips the COUNT query and
+    returns (pages, next_cursor); the offset path returns (pages, total).
+    Counts are cached for a short TTL per filter combination; pass
+    `include_total=False` to skip the count entirely (total is None).
+    """
+    try:
+        with db_cursor(dict_cursor=True, commit=False) as cur:
+            base_query = "FROM pages WHERE run_id = %s"
+            params = [run_id]
 
-        # Get total count
-        cur.execute(f"SELECT COUNT(*) {base_query}", tuple(params))
-        total = cur.fetchone()['count']
+            if search:
+                base_query += " AND (url ILIKE %s OR domain ILIKE %s)"
+                params.extend([f"%{search}%", f"%{search}%"])
 
-        # Get paginated results
-        offset = (page - 1) * per_page
-        query = f"SELECT * {base_query} ORDER BY timestamp DESC LIMIT %s OFFSET %s"
-        params.extend([per_page, offset])
+            if domain_filter:
+                base_query += " AND domain = %s"
+                params.append(domain_filter)
 
-        cur.execute(query, tuple(params))
-        pages = cur.fetchall()
+            if cursor is not None:
+                # Keyset pagination: seek past the cursor row, no COUNT round-trip
+                query = (f"SELECT * {base_query} AND (timestamp, id) < (%s, %s) "
+                         "ORDER BY timestamp DESC, id DESC LIMIT %s")
+                params.extend([cursor[0], cursor[1], per_page])
+                cur.execute(query, tuple(params))
+                pages = cur.fetchall()
+                next_cursor = (pages[-1]['timestamp'], pages[-1]['id']) if pages else None
+                return pages, next_cursor
 
-        cur.close()
-        return pages, total
+            # Get total count (cached briefly so repeat pageviews skip the round-trip)
+            total = None
+            if include_total:
+                cache_key = (run_id, search, domain_filter)
+                cached = _count_cache.get(cache_key)
+                if cached is not None and time.monotonic() - cached[1] < _COUNT_CACHE_TTL:
+                    total = cached[0]
+                else:
+                    cur.execute(f"SELECT COUNT(*) {base_query}", tuple(params))
+                    total = cur.fetchone()['count']
+                    _count_cache_store(cache_key, total)
+
+            # Get paginated results
+            offset = (page - 1) * per_page
+            query = f"SELECT * {base_query} ORDER BY timestamp DESC, id DESC LIMIT %s OFFSET %s"
+            params.extend([per_page, offset])
+
+            cur.execute(query, tuple(params))
+            return cur.fetchall(), total
     except (Exception, psycopg2.DatabaseError) as error:
         logger.error(error)
         return [], 0
-    finally:
-        if conn is not None:
-            release_db_connection(conn)
 
 if __name__ == '__main__':
     init_db_pool()
@@ -0,0 +1,87 @@
+
+import os
+import json
+import asyncpg
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+pool = None
+
+async def init_pool():
+    """Initializes the asyncpg connection pool."""
+    global pool
+    if pool is None:
+        try:
+            pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.error(f"Could not connect to the database: {e}", exc_info=True)
+            raise
+    return pool
+
+async def close_pool():
+    """Closes the connection pool."""
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+async def create_run(start_url, status="running"):
+    """Creates a new run in the database and returns the run ID."""
+    sql = "INSERT INTO runs(start_url, status) VALUES($1, $2) RETURNING id;"
+    try:
+        await init_pool()
+        async with pool.acquire() as conn:
+            return await conn.fetchval(sql, start_url, status)
+    except (Exception, asyncpg.PostgresError) as error:
+        logger.error(error)
+        return None
+
+async def update_run(run_id, stats, domain_counts, status="completed"):
+    """Updates a run with stats, domain_counts, and status."""
+    sql = "UPDATE runs SET stats = $1, domain_counts = $2, status = $3 WHERE id = $4;"
+    try:
+        await init_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(sql, json.dumps(stats), json.dumps(domain_counts), status, run_id)
+    except (Exception, asyncpg.PostgresError) as error:
+        logger.error(error)
+
+# Whether the pages(run_id, url) unique index exists; cleared the first
+# time Postgres rejects ON CONFLICT for lack of a matching constraint.
+_pages_conflict_safe = True
+
+async def insert_pages(run_id, rows):
+    """Inserts a batch of pages for a run using pipelined binds.
+
+    Each row is a (url, content_type, filepath, depth, size, domain) tuple.
+    """
+    global _pages_conflict_safe
+    if not rows:
+        return
+    base_sql = """INSERT INTO pages(run_id, url, content_type, filepath, depth, size, domain)
+             VALUES($1, $2, $3, $4, $5, $6, $7)"""
+    args = [(run_id,) + tuple(row) for row in rows]
+    try:
+        await init_pool()
+        async with pool.acquire() as conn:
+            if _pages_conflict_safe:
+                try:
+                    await conn.executemany(
+                        base_sql + " ON CONFLICT (run_id, url) DO NOTHING;", args)
+                    return
+                except asyncpg.InvalidColumnReferenceError as error:
+                    # The unique index backing ON CONFLICT is missing
+                    # (setup_database() could not build it); stick to plain
+                    # inserts from here on.
+                    _pages_conflict_safe = False
+                    logger.warning(
+                        f"ON CONFLICT unavailable, "
+                        f"falling back to plain inserts: {error}")
+            await conn.executemany(base_sql + ";", args)
+    except (Exception, asyncpg.PostgresError) as error:
+        logger.error(error)
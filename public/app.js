@@ -185,15 +185,11 @@ async function checkScrapeStatus() {
                 document.getElementById('logContent').textContent = logText;
                 document.getElementById('scrapeLog').style.display = 'block';
                 for (const line of logText.split('\n')) {
-                    if (line.startsWith('#')) {
-                        const log_Text = line.slice(1)
-                        console.log(line)
-                        console.log(log_Text.split(';')[0]);
-
-                        const pagesScraped = log_Text.split(';')[0];
-                        const maxPages = log_Text.split(';')[1];
-                        const assetsDownloaded = log_Text.split(';')[2];
-                        updateProgress(pagesScraped, maxPages, assetsDownloaded);
+                    // Progress feed "#scraped; max; assets" sits after the
+                    // logger's timestamp/level prefix
+                    const match = line.match(/#(\d+); (\d+); (\d+)\s*$/);
+                    if (match) {
+                        updateProgress(match[1], match[2], match[3]);
                     }
                 }
             }
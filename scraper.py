@@ -1,22 +1,55 @@
 import asyncio
 import aiohttp
-import aiofiles
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from urllib.parse import urljoin, urlparse
 import os
+import re
 import json
 import time
+import heapq
+from collections import deque
+from operator import itemgetter
 from datetime import datetime
+from functools import lru_cache
 from typing import Set, Dict, Optional, Tuple
 from tqdm.asyncio import tqdm
 import logging
-from utils import URLFilter, RobotsChecker, ScraperStats, save_json, ensure_directories
+from utils import URLFilter, RobotsChecker, ScraperStats, save_json, save_json_atomic, save_json_streaming, load_json, ensure_directories, canonical_domain
+from utils import urlparse as _cached_urlparse  # shared lru_cache'd urlparse
 import hashlib
 import random
-import database
+import db_async
 
 logger = logging.getLogger(__name__)
 
+# Matches url(...) references in CSS, capturing the bare URL
+_CSS_URL_RE = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+# The same URLs are joined over and over while rewriting pages; memoize
+# the pure function (parsing uses the cache shared with utils)
+_cached_urljoin = lru_cache(maxsize=8192)(urljoin)
+
+# Asset filenames only need a stable, collision-resistant digest, not a
+# cryptographic one; xxhash is much faster than md5 on short inputs
+try:
+    import xxhash
+
+    def _hash_url(url: str) -> str:
+        return xxhash.xxh128_hexdigest(url)
+except ImportError:
+    def _hash_url(url: str) -> str:
+        return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+
+def _write_bytes(path: str, data: bytes):
+    """Blocking write helper; call via asyncio.to_thread."""
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _write_text(path: str, data: str):
+    """Blocking write helper; call via asyncio.to_thread."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+
 class WebScraper:
     def __init__(self, 
                  start_url: str,
@@ -43,21 +76,53 @@ class WebScraper:
         self.skip_assets = skip_assets
         
         self.visited_urls: Set[str] = set()
+        self.scraped_data: Dict[str, Dict] = {}  # URL -> page metadata
         self.asset_map: Dict[str, str] = {}  # Map original URLs to local paths
         self.failed_assets: Set[str] = set()  # Track failed assets to avoid retrying
-        self.queue = asyncio.Queue()
-        self.semaphore = asyncio.Semaphore(max_workers)
-        self.robots_checker = RobotsChecker() if respect_robots else None
+        self._asset_inflight: Dict[str, asyncio.Future] = {}  # URL -> pending download
+        self._path_cache: Dict[Tuple[str, str], str] = {}  # (url, asset_type) -> local path
+
+        # Work queue: a plain deque plus an Event wakeup. Everything runs on
+        # one event loop, so asyncio.Queue's internal lock and per-op
+        # Condition round trips are pure overhead here. _pending counts
+        # queued + in-progress items; _idle replaces queue.join().
+        self._work: deque = deque()
+        self._work_available = asyncio.Event()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # Separate concurrency caps for pages and assets so a page waiting
+        # to be parsed never queues behind a burst of asset downloads. A
+        # Condition + counter (rather than a Semaphore) lets the cap shrink
+        # at runtime when a domain starts returning 429s.
+        self._page_cond = asyncio.Condition()
+        self._asset_cond = asyncio.Condition()
+        self._page_active = 0
+        self._asset_active = 0
+        self._page_cap = max_workers
+        self._asset_cap = max_workers * 2
+        # Persisted robots cache makes repeat runs revalidate with
+        # conditional GETs instead of re-downloading every robots.txt.
+        # It lives beside the run directories, not inside one: a new run
+        # mints a fresh directory and would never see a per-run cache.
+        robots_cache_path = os.path.join(
+            os.path.dirname(os.path.normpath(output_dir)) or '.', 'robots_cache.json')
+        self.robots_checker = RobotsChecker(
+            cache_path=robots_cache_path) if respect_robots else None
         self.stats = ScraperStats()
         self.domain_counts: Dict[str, int] = {}
         self.last_request_time: Dict[str, float] = {}
-        
-        # Store cookies per domain
-        self.domain_cookies: Dict[str, Dict] = {}
-        
+        self._domain_locks: Dict[str, asyncio.Lock] = {}
+
+        # Buffer completed pages and flush them to the database in batches
+        self.page_buffer = []
+        self.page_flush_size = 50
+
         # Page limit tracking
         self.pages_scraped_count = 0
         self.should_stop = False
+        self._stop_event = asyncio.Event()  # set alongside should_stop
         self.stop_lock = asyncio.Lock()
         
         # User agents pool for rotation
@@ -79,6 +144,23 @@ class WebScraper:
             f"{output_dir}/fonts",
             f"{output_dir}/media"
         )
+
+        # Resume support: reload the asset sidecar from a previous
+        # interrupted run so assets already on disk are not re-downloaded
+        self._asset_map_path = f"{output_dir}/asset_map.json"
+        self._assets_since_save = 0
+        self._asset_map_lock = asyncio.Lock()
+        try:
+            sidecar = load_json(self._asset_map_path)
+        except (ValueError, OSError) as e:
+            # A torn sidecar (crawl killed mid-save) shouldn't block every
+            # future run; resume just starts from scratch
+            logger.warning(f"Ignoring unreadable asset sidecar {self._asset_map_path}: {e}")
+            sidecar = {}
+        if sidecar:
+            self.asset_map.update(sidecar.get('assets', {}))
+            self.failed_assets.update(sidecar.get('failed', []))
+            logger.info(f"Resuming with {len(self.asset_map)} known assets from {self._asset_map_path}")
     
     def get_headers(self, referer: str = None, is_asset: bool = False) -> Dict:
         """Get headers that mimic a real browser"""
@@ -115,10 +197,14 @@ class WebScraper:
     
     def get_asset_local_path(self, url: str, asset_type: str) -> str:
         """Generate local path for an asset"""
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        
+        cached = self._path_cache.get((url, asset_type))
+        if cached is not None:
+            return cached
+
+        url_hash = _hash_url(url)
+
         # Try to preserve file extension
-        parsed_path = urlparse(url).path
+        parsed_path = _cached_urlparse(url).path
         ext = os.path.splitext(parsed_path)[1] or '.bin'
         
         # Clean up extension
@@ -147,369 +233,504 @@ class WebScraper:
             subdir = 'media'
         else:
             subdir = 'assets'
-        
-        return f"{subdir}/{url_hash}{ext}"
+
+        local_path = f"{subdir}/{url_hash}{ext}"
+        self._path_cache[(url, asset_type)] = local_path
+        return local_path
     
+    def _put_work(self, item):
+        """Enqueue a (url, depth) pair."""
+        self._work.append(item)
+        self._pending += 1
+        self._idle.clear()
+        self._work_available.set()
+
+    async def _get_work(self):
+        while not self._work:
+            self._work_available.clear()
+            await self._work_available.wait()
+        return self._work.popleft()
+
+    def _work_done(self):
+        self._pending -= 1
+        if self._pending <= 0:
+            self._idle.set()
+
+    def _drain_work(self):
+        """Discard queued items (used when a stop is signaled)."""
+        while self._work:
+            self._work.popleft()
+            self._work_done()
+
+    def _signal_stop(self):
+        self.should_stop = True
+        self._stop_event.set()
+
+    async def _acquire_page_slot(self):
+        async with self._page_cond:
+            await self._page_cond.wait_for(lambda: self._page_active < self._page_cap)
+            self._page_active += 1
+
+    async def _release_page_slot(self):
+        async with self._page_cond:
+            self._page_active -= 1
+            self._page_cond.notify(1)
+
+    async def _acquire_asset_slot(self):
+        async with self._asset_cond:
+            await self._asset_cond.wait_for(lambda: self._asset_active < self._asset_cap)
+            self._asset_active += 1
+
+    async def _release_asset_slot(self):
+        async with self._asset_cond:
+            self._asset_active -= 1
+            self._asset_cond.notify(1)
+
+    async def _throttle_assets(self):
+        """Shrink the asset cap in response to HTTP 429 backpressure."""
+        async with self._asset_cond:
+            if self._asset_cap > 2:
+                self._asset_cap -= 1
+                logger.warning(f"Throttling asset downloads to {self._asset_cap} concurrent after HTTP 429")
+
     async def download_asset(self, session: aiohttp.ClientSession, url: str, asset_type: str, referer: str = None) -> Optional[str]:
-        with open('web_archiver.log', 'a') as log_file:
-            """Download an asset and return its local path"""
+        """Download an asset and return its local path"""
+        # Skip if already downloaded or failed before
+        if url in self.asset_map:
+            return self.asset_map[url]
+
+        if url in self.failed_assets:
+            return None
+
+        # A previous run may have written the file without a sidecar entry
+        local_path = self.get_asset_local_path(url.split('#')[0], asset_type)
+        if os.path.exists(f"{self.output_dir}/{local_path}"):
+            self.asset_map[url] = local_path
+            return local_path
+
+        # If another coroutine is already fetching this URL, await its result
+        # instead of downloading (and writing) the same asset twice
+        inflight = self._asset_inflight.get(url)
+        if inflight is not None:
+            return await inflight
+
+        fut = asyncio.get_event_loop().create_future()
+        self._asset_inflight[url] = fut
+        try:
+            local_path = await self._download_asset_once(session, url, asset_type, referer)
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(local_path)
+            if local_path:
+                self._assets_since_save += 1
+                if self._assets_since_save >= 100:
+                    self._assets_since_save = 0
+                    await self._save_asset_map()
+            return local_path
+        finally:
+            del self._asset_inflight[url]
+
+    async def _save_asset_map(self):
+        """Persist the asset map sidecar so an interrupted crawl can resume."""
+        # Serialized so overlapping saves can't race on the temp sibling
+        async with self._asset_map_lock:
+            payload = {'assets': dict(self.asset_map), 'failed': sorted(self.failed_assets)}
+            await asyncio.to_thread(save_json_atomic, payload, self._asset_map_path)
+
+    async def _stream_to_file(self, response: aiohttp.ClientResponse, path: str):
+        """Stream a response body to disk in 64 KiB chunks.
+
+        Keeps peak memory flat regardless of asset size instead of
+        materializing the whole body before the first write.
+        """
+        f = await asyncio.to_thread(open, path, 'wb')
+        try:
+            async for chunk in response.content.iter_chunked(65536):
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def _download_asset_once(self, session: aiohttp.ClientSession, url: str, asset_type: str, referer: str = None) -> Optional[str]:
+        try:
+            # Clean URL (remove fragments)
+            clean_url = url.split('#')[0]
+
+            # Apply rate limiting
+            domain = _cached_urlparse(clean_url).netloc
+            await self.apply_rate_limit(domain)
+
+            # Get appropriate headers; the session's CookieJar attaches any
+            # matching cookies automatically
+            headers = self.get_headers(referer=referer, is_asset=True)
+
+            await self._acquire_asset_slot()
             try:
-                # Skip if already downloaded or failed before
-                if url in self.asset_map:
-                    return self.asset_map[url]
-                
-                if url in self.failed_assets:
-                    return None
-                
-                # Clean URL (remove fragments)
-                clean_url = url.split('#')[0]
-                
-                # Apply rate limiting
-                domain = urlparse(clean_url).netloc
-                await self.apply_rate_limit(domain)
-                
-                # Get appropriate headers
-                headers = self.get_headers(referer=referer, is_asset=True)
-                
-                # Add cookies if we have them for this domain
-                cookies = self.domain_cookies.get(domain, {})
-                
-                async with self.semaphore:
-                    try:
-                        async with session.get(
-                            clean_url, 
-                            timeout=30, 
-                            ssl=False,
-                            headers=headers,
-                            cookies=cookies,
-                            allow_redirects=True
-                        ) as response:
-                            
-                            # Handle different response codes
-                            if response.status == 200:
-                                content = await response.read()
-                                
-                                # Generate local path
-                                local_path = self.get_asset_local_path(clean_url, asset_type)
-                                full_path = f"{self.output_dir}/{local_path}"
-                                
-                                # Save asset
-                                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                                
-                                if asset_type in ['css', 'js']:
-                                    # Text assets
-                                    try:
-                                        text_content = content.decode('utf-8', errors='ignore')
-                                        async with aiofiles.open(full_path, 'w', encoding='utf-8') as f:
-                                            await f.write(text_content)
-                                    except:
-                                        # If decode fails, save as binary
-                                        async with aiofiles.open(full_path, 'wb') as f:
-                                            await f.write(content)
-                                else:
-                                    # Binary assets
-                                    async with aiofiles.open(full_path, 'wb') as f:
-                                        await f.write(content)
-                                
-                                # Store mapping
-                                self.asset_map[url] = local_path
-                                logger.debug(f"Downloaded asset: {url} -> {local_path}")
-                                log_file.write(f"Downloaded asset: {url} -> {local_path}\n")
-                                
-                                return local_path
-                                
-                            elif response.status == 403:
-                                # Try alternative approach for 403
-                                logger.debug(f"403 for asset {url}, trying with different headers")
-                                log_file.write(f"403 for asset {url}, trying with different headers\n")
-                                
-                                # Try with minimal headers
-                                minimal_headers = {
-                                    'User-Agent': headers['User-Agent']
-                                }
-                                
-                                async with session.get(
-                                    clean_url,
-                                    timeout=30,
-                                    ssl=False,
-                                    headers=minimal_headers
-                                ) as retry_response:
-                                    if retry_response.status == 200:
-                                        content = await retry_response.read()
-                                        local_path = self.get_asset_local_path(clean_url, asset_type)
-                                        full_path = f"{self.output_dir}/{local_path}"
-                                        
-                                        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                                        async with aiofiles.open(full_path, 'wb') as f:
-                                            await f.write(content)
-                                        
-                                        self.asset_map[url] = local_path
-                                        return local_path
-                                    else:
-                                        logger.warning(f"Failed to download asset {url}: HTTP {retry_response.status}")
-                                        log_file.write(f"Failed to download asset {url}: HTTP {retry_response.status}\n")
-                                        self.failed_assets.add(url)
-                                        return None
+                try:
+                    async with session.get(
+                        clean_url,
+                        timeout=30,
+                        ssl=False,
+                        headers=headers,
+                        allow_redirects=True
+                    ) as response:
+
+                        # Handle different response codes
+                        if response.status == 200:
+                            # Generate local path
+                            # Save asset; all subdirs were created in __init__
+                            local_path = self.get_asset_local_path(clean_url, asset_type)
+                            full_path = f"{self.output_dir}/{local_path}"
+
+                            if asset_type in ['css', 'js']:
+                                # Text assets are small; accumulate then decode
+                                buf = bytearray()
+                                async for chunk in response.content.iter_chunked(65536):
+                                    buf.extend(chunk)
+                                content = bytes(buf)
+                                try:
+                                    text_content = content.decode('utf-8', errors='ignore')
+                                    await asyncio.to_thread(_write_text, full_path, text_content)
+                                except:
+                                    # If decode fails, save as binary
+                                    await asyncio.to_thread(_write_bytes, full_path, content)
                             else:
-                                logger.warning(f"Failed to download asset {url}: HTTP {response.status}")
-                                log_file.write(f"Failed to download asset {url}: HTTP {response.status}\n")
-                                self.failed_assets.add(url)
-                                return None
-                                
-                    except asyncio.TimeoutError:
-                        logger.warning(f"Timeout downloading asset {url}")
-                        log_file.write(f"Timeout downloading asset {url}\n")
-                        self.failed_assets.add(url)
-                        return None
-                        
-            except Exception as e:
-                logger.error(f"Error downloading asset {url}: {e}")
-                log_file.write(f"Error downloading asset {url}: {e}\n")
-                self.failed_assets.add(url)
-                return None
+                                # Binary assets (images, fonts, media) can be
+                                # arbitrarily large; stream straight to disk
+                                await self._stream_to_file(response, full_path)
+
+                            # Store mapping
+                            self.asset_map[url] = local_path
+                            logger.debug(f"Downloaded asset: {url} -> {local_path}")
+
+                            return local_path
+
+                        elif response.status == 403:
+                            # Try alternative approach for 403
+                            logger.debug(f"403 for asset {url}, trying with different headers")
+
+                            # Try with minimal headers
+                            minimal_headers = {
+                                'User-Agent': headers['User-Agent']
+                            }
+
+                            async with session.get(
+                                clean_url,
+                                timeout=30,
+                                ssl=False,
+                                headers=minimal_headers
+                            ) as retry_response:
+                                if retry_response.status == 200:
+                                    local_path = self.get_asset_local_path(clean_url, asset_type)
+                                    full_path = f"{self.output_dir}/{local_path}"
+
+                                    await self._stream_to_file(retry_response, full_path)
+
+                                    self.asset_map[url] = local_path
+                                    return local_path
+                                else:
+                                    logger.warning(f"Failed to download asset {url}: HTTP {retry_response.status}")
+                                    self.failed_assets.add(url)
+                                    return None
+                        else:
+                            if response.status == 429:
+                                await self._throttle_assets()
+                            logger.warning(f"Failed to download asset {url}: HTTP {response.status}")
+                            self.failed_assets.add(url)
+                            return None
+
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timeout downloading asset {url}")
+                    self.failed_assets.add(url)
+                    return None
+            finally:
+                await self._release_asset_slot()
+
+        except Exception as e:
+            logger.error(f"Error downloading asset {url}: {e}")
+            self.failed_assets.add(url)
+            return None
     
-    async def rewrite_html_urls(self, html: str, base_url: str, session: aiohttp.ClientSession) -> str:
-        """Rewrite URLs in HTML to point to local assets"""
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # Process different types of assets
+    async def rewrite_html_urls(self, html: str, base_url: str, session: aiohttp.ClientSession) -> Tuple[str, Set[str]]:
+        """Rewrite URLs in HTML to point to local assets.
+
+        Returns the rewritten HTML plus the set of scrapeable links found in
+        the same pass, so the caller never has to parse the page twice.
+        """
+        tree = HTMLParser(html)
+
         asset_tasks = []
-        
-        # Images
-        for img in soup.find_all(['img', 'source', 'picture']):
-            for attr in ['src', 'srcset', 'data-src', 'data-srcset', 'data-lazy-src']:
-                if img.get(attr):
+        extracted_links = set()
+        dirty = False  # Serialize the tree only if something actually changed
+
+        # CSS in style tags (for url() references); selectolax can't replace
+        # element text in place, so these are applied on the serialized
+        # output below
+        css_rewrites = []
+
+        # One traversal of the DOM, dispatching on tag name, instead of a
+        # separate tree.css() walk per asset class. <source> tags are
+        # classified once here rather than matching both the image and the
+        # media selectors.
+        for node in (tree.root.traverse(include_text=False) if tree.root is not None else ()):
+            tag = node.tag
+            attrs = node.attributes
+
+            if tag in ('img', 'source', 'picture'):
+                for attr in ('src', 'srcset', 'data-src', 'data-srcset', 'data-lazy-src'):
+                    value = attrs.get(attr)
+                    # Inlined data: URIs can be hundreds of KB; bail before
+                    # any splitting or joining touches them
+                    if not value or value[:5] == 'data:':
+                        continue
+
                     urls = []
                     # Handle srcset which can have multiple URLs
                     if 'srcset' in attr:
-                        srcset_parts = img[attr].split(',')
+                        srcset_parts = value.split(',')
                         for part in srcset_parts:
                             url_part = part.strip().split(' ')[0]
-                            if url_part:
+                            if url_part and url_part[:5] != 'data:':
                                 urls.append(url_part)
                     else:
-                        urls.append(img[attr])
-                    
+                        urls.append(value)
+
                     for url in urls:
-                        if url and not url.startswith('data:'):
-                            absolute_url = urljoin(base_url, url)
-                            asset_tasks.append((img, attr, url, absolute_url, 'image'))
-        
-        # CSS files
-        for link in soup.find_all('link'):
-            if link.get('rel') and 'stylesheet' in link.get('rel') and link.get('href'):
-                url = link['href']
-                if not url.startswith('data:'):
-                    absolute_url = urljoin(base_url, url)
-                    asset_tasks.append((link, 'href', url, absolute_url, 'css'))
-        
-        # JavaScript files
-        for script in soup.find_all('script'):
-            if script.get('src'):
-                url = script['src']
-                if not url.startswith('data:'):
-                    absolute_url = urljoin(base_url, url)
-                    asset_tasks.append((script, 'src', url, absolute_url, 'js'))
-        
-        # Fonts in link tags
-        for link in soup.find_all('link'):
-            if link.get('rel') and 'font' in str(link.get('rel')) and link.get('href'):
-                url = link['href']
-                if not url.startswith('data:'):
-                    absolute_url = urljoin(base_url, url)
-                    asset_tasks.append((link, 'href', url, absolute_url, 'font'))
-        
-        # Video and audio
-        for media in soup.find_all(['video', 'audio', 'source']):
-            if media.get('src'):
-                url = media['src']
-                if not url.startswith('data:'):
-                    absolute_url = urljoin(base_url, url)
-                    asset_tasks.append((media, 'src', url, absolute_url, 'media'))
-        
-        # CSS in style tags (for url() references)
-        for style in soup.find_all('style'):
-            if style.string:
-                style.string = await self.rewrite_css_urls(style.string, base_url, session)
-        
-        # Inline styles with url()
-        for element in soup.find_all(style=True):
-            element['style'] = await self.rewrite_css_urls(element['style'], base_url, session)
-        
+                        absolute_url = _cached_urljoin(base_url, url)
+                        asset_tasks.append((node, attr, url, absolute_url, 'image'))
+
+            elif tag == 'link':
+                rel = attrs.get('rel') or ''
+                url = attrs.get('href')
+                if url and not url.startswith('data:'):
+                    if 'stylesheet' in rel:
+                        asset_tasks.append((node, 'href', url, _cached_urljoin(base_url, url), 'css'))
+                    elif 'font' in rel:
+                        asset_tasks.append((node, 'href', url, _cached_urljoin(base_url, url), 'font'))
+
+            elif tag == 'script':
+                url = attrs.get('src')
+                if url and not url.startswith('data:'):
+                    asset_tasks.append((node, 'src', url, _cached_urljoin(base_url, url), 'js'))
+
+            elif tag in ('video', 'audio'):
+                url = attrs.get('src')
+                if url and not url.startswith('data:'):
+                    asset_tasks.append((node, 'src', url, _cached_urljoin(base_url, url), 'media'))
+
+            elif tag == 'style':
+                css_text = node.text()
+                if css_text:
+                    new_css = await self.rewrite_css_urls(css_text, base_url, session)
+                    if new_css != css_text:
+                        css_rewrites.append((css_text, new_css))
+
+            elif tag in ('a', 'area'):
+                href = attrs.get('href')
+                if href and not href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+                    absolute_url = _cached_urljoin(base_url, href)
+                    if URLFilter.should_scrape(absolute_url, self.base_domain):
+                        extracted_links.add(absolute_url)
+                    # Link pages we have locally, keep the rest absolute
+                    if absolute_url in self.visited_urls:
+                        url_hash = URLFilter.get_url_hash(absolute_url)
+                        new_href = f"{url_hash}.html"
+                    else:
+                        new_href = absolute_url
+                    if new_href != href:
+                        node.attrs['href'] = new_href
+                        dirty = True
+
+            # Inline styles with url() can appear on any element
+            style_attr = attrs.get('style')
+            if style_attr:
+                new_style = await self.rewrite_css_urls(style_attr, base_url, session)
+                if new_style != style_attr:
+                    node.attrs['style'] = new_style
+                    dirty = True
+
         # Download assets and update URLs
         if not self.skip_assets:
-            # Process assets with referer header
+            # Download each unique asset once, concurrently; the asset cap and
+            # connector limits still bound how many are actually in flight
+            unique_downloads = {}
+            for _, _, _, absolute_url, asset_type in asset_tasks:
+                if absolute_url not in unique_downloads:
+                    unique_downloads[absolute_url] = self.download_asset(
+                        session, absolute_url, asset_type, referer=base_url)
+            results = await asyncio.gather(*unique_downloads.values(), return_exceptions=True)
+            local_paths = {
+                url: (result if not isinstance(result, BaseException) else None)
+                for url, result in zip(unique_downloads, results)
+            }
+
+            # Resolve every original URL to its replacement first; srcset
+            # attributes are then rewritten in one split/join pass each
+            # rather than once per URL they contain
+            url_replacements = {}
+            srcset_attrs = []
+            seen_srcset = set()
             for element, attr, original_url, absolute_url, asset_type in asset_tasks:
-                local_path = await self.download_asset(session, absolute_url, asset_type, referer=base_url)
+                local_path = local_paths.get(absolute_url)
                 if local_path:
-                    # Update the URL to point to local file
-                    # Use relative path from html directory
-                    relative_path = f"../{local_path}"
-                    
-                    if 'srcset' in attr:
-                        # Handle srcset specially
-                        srcset_parts = element[attr].split(',')
-                        new_srcset = []
-                        for part in srcset_parts:
-                            part_items = part.strip().split(' ')
-                            if part_items[0] == original_url:
-                                part_items[0] = relative_path
-                            new_srcset.append(' '.join(part_items))
-                        element[attr] = ', '.join(new_srcset)
-                    else:
-                        element[attr] = relative_path
-                else:
+                    # Point at the local file, relative to the html directory
+                    replacement = f"../{local_path}"
+                elif not original_url.startswith(('http://', 'https://', '//')):
                     # If download failed, keep original URL but make it absolute
-                    if not original_url.startswith(('http://', 'https://', '//')):
-                        element[attr] = absolute_url
-        
-        # Process links to make them work locally
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if not href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
-                absolute_url = urljoin(base_url, href)
-                # Check if we have this page
-                if absolute_url in self.visited_urls:
-                    # Link to local HTML file
-                    url_hash = URLFilter.get_url_hash(absolute_url)
-                    a['href'] = f"{url_hash}.html"
+                    replacement = absolute_url
                 else:
-                    # Keep as external link but make it absolute
-                    a['href'] = absolute_url
-        
-        return str(soup)
+                    replacement = None
+
+                if 'srcset' in attr:
+                    if replacement:
+                        url_replacements[original_url] = replacement
+                    key = (id(element), attr)
+                    if key not in seen_srcset:
+                        seen_srcset.add(key)
+                        srcset_attrs.append((element, attr))
+                elif replacement and replacement != original_url:
+                    element.attrs[attr] = replacement
+                    dirty = True
+
+            for element, attr in srcset_attrs:
+                old_srcset = element.attributes.get(attr) or ''
+                new_srcset = []
+                for part in old_srcset.split(','):
+                    part_items = part.strip().split(' ')
+                    part_items[0] = url_replacements.get(part_items[0], part_items[0])
+                    new_srcset.append(' '.join(part_items))
+                new_value = ', '.join(new_srcset)
+                if new_value != old_srcset:
+                    element.attrs[attr] = new_value
+                    dirty = True
+
+        if not dirty and not css_rewrites:
+            # Nothing was mutated; hand back the original string instead of
+            # paying for tree serialization
+            return html, extracted_links
+
+        html_out = tree.html
+        for old_css, new_css in css_rewrites:
+            html_out = html_out.replace(old_css, new_css)
+        return html_out, extracted_links
     
     async def rewrite_css_urls(self, css_content: str, base_url: str, session: aiohttp.ClientSession) -> str:
         """Rewrite URLs in CSS content"""
-        import re
-        
-        # Find all url() references
-        url_pattern = r'urlKATEX_INLINE_OPEN[\'"]?([^\'")]+)[\'"]?KATEX_INLINE_CLOSE'
-        
-        urls = re.findall(url_pattern, css_content)
+        urls = _CSS_URL_RE.findall(css_content)
+        if not urls:
+            return css_content
+
+        # Download each unique referenced asset once, concurrently
+        downloads = {}
         for url in urls:
-            if not url.startswith('data:'):
-                absolute_url = urljoin(base_url, url)
-                
-                # Determine asset type from URL
-                asset_type = 'image'  # Default
-                if '.woff' in url or '.ttf' in url or '.eot' in url or '.otf' in url:
-                    asset_type = 'font'
-                
-                local_path = await self.download_asset(session, absolute_url, asset_type, referer=base_url)
-                if local_path:
-                    relative_path = f"../{local_path}"
-                    # Replace all variations of the URL reference
-                    css_content = css_content.replace(f'url({url})', f'url({relative_path})')
-                    css_content = css_content.replace(f'url("{url}")', f'url("{relative_path}")')
-                    css_content = css_content.replace(f"url('{url}')", f'url("{relative_path}")')
-        
-        return css_content
+            if url.startswith('data:') or url in downloads:
+                continue
+            absolute_url = _cached_urljoin(base_url, url)
+
+            # Determine asset type from URL
+            asset_type = 'image'  # Default
+            if '.woff' in url or '.ttf' in url or '.eot' in url or '.otf' in url:
+                asset_type = 'font'
+
+            downloads[url] = self.download_asset(session, absolute_url, asset_type, referer=base_url)
+
+        results = await asyncio.gather(*downloads.values(), return_exceptions=True)
+        url_to_local = {
+            url: f"../{result}"
+            for url, result in zip(downloads, results)
+            if result and not isinstance(result, BaseException)
+        }
+        if not url_to_local:
+            return css_content
+
+        # Single substitution pass instead of repeated full-string replaces
+        return _CSS_URL_RE.sub(
+            lambda m: f'url("{url_to_local.get(m.group(1), m.group(1))}")',
+            css_content)
     
-    async def fetch_page(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[str, str, Dict]]:
-        with open('web_archiver.log', 'a') as log_file:
-            """Fetch a single page and return content, content-type, and cookies"""
+    async def fetch_page(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[str, str]]:
+        """Fetch a single page and return content and content-type"""
+        try:
+            # Check robots.txt
+            if self.robots_checker:
+                can_fetch = await self.robots_checker.can_fetch(url, 'WebArchiver/1.0')
+                if not can_fetch:
+                    logger.info(f"Robots.txt disallows: {url}")
+                    return None
+
+            # Apply rate limiting
+            domain = _cached_urlparse(url).netloc
+            await self.apply_rate_limit(domain)
+
+            # Get headers for page request
+            headers = self.get_headers()
+
+            await self._acquire_page_slot()
             try:
-                # Check robots.txt
-                if self.robots_checker:
-                    can_fetch = await self.robots_checker.can_fetch(url, 'WebArchiver/1.0')
-                    if not can_fetch:
-                        logger.info(f"Robots.txt disallows: {url}")
-                        log_file.write(f"Robots.txt disallows: {url}\n")
+                async with session.get(
+                    url,
+                    timeout=30,
+                    ssl=False,
+                    headers=headers,
+                    allow_redirects=True
+                ) as response:
+                    if response.status == 200:
+                        content = await response.text()
+                        content_type = response.headers.get('Content-Type', '')
+
+                        return content, content_type
+                    else:
+                        logger.warning(f"HTTP {response.status} for {url}")
                         return None
-                
-                # Apply rate limiting
-                domain = urlparse(url).netloc
-                await self.apply_rate_limit(domain)
-                
-                # Get headers for page request
-                headers = self.get_headers()
-                
-                async with self.semaphore:
-                    async with session.get(
-                        url, 
-                        timeout=30, 
-                        ssl=False,
-                        headers=headers,
-                        allow_redirects=True
-                    ) as response:
-                        if response.status == 200:
-                            content = await response.text()
-                            content_type = response.headers.get('Content-Type', '')
-                            
-                            # Store cookies for this domain
-                            if response.cookies:
-                                self.domain_cookies[domain] = dict(response.cookies)
-                            
-                            return content, content_type, dict(response.cookies)
-                        else:
-                            logger.warning(f"HTTP {response.status} for {url}")
-                            log_file.write(f"HTTP {response.status} for {url}\n")
-                            return None
-                            
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout fetching {url}")
-                log_file.write(f"Timeout fetching {url}\n")
-                self.stats.add_failed()
-            except Exception as e:
-                logger.error(f"Error fetching {url}: {e}")
-                log_file.write(f"Error fetching {url}: {e}\n")
-                self.stats.add_failed()
-            return None
+            finally:
+                await self._release_page_slot()
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout fetching {url}")
+            self.stats.add_failed()
+        except Exception as e:
+            logger.error(f"Error fetching {url}: {e}")
+            self.stats.add_failed()
+        return None
     
     async def check_limits(self, url: str) -> bool:
-        with open('web_archiver.log', 'a') as log_file:
-            """Check if we should continue scraping based on limits"""
-            async with self.stop_lock:
-                # Check global page limit
-                if self.pages_scraped_count >= self.max_pages:
-                    if not self.should_stop:
-                        logger.info(f"Reached maximum page limit: {self.max_pages}")
-                        log_file.write(f"Reached maximum page limit: {self.max_pages}\n")
-                        self.should_stop = True
-                    return False
-
-                # Check per-domain limit
-                domain = urlparse(url).netloc
-                domain_count = self.domain_counts.get(domain, 0)
-
-                if domain_count >= self.pages_per_domain:
-                    logger.warning(f"Reached limit for domain {domain}: {self.pages_per_domain} pages")
-                    log_file.write(f"Reached limit for domain {domain}: {self.pages_per_domain} pages\n")
-                    return False
-
-                return True
+        """Check if we should continue scraping based on limits"""
+        async with self.stop_lock:
+            # Check global page limit
+            if self.pages_scraped_count >= self.max_pages:
+                if not self.should_stop:
+                    logger.info(f"Reached maximum page limit: {self.max_pages}")
+                    self._signal_stop()
+                return False
+
+            # Check per-domain limit
+            domain = _cached_urlparse(url).netloc
+            domain_count = self.domain_counts.get(domain, 0)
+
+            if domain_count >= self.pages_per_domain:
+                logger.warning(f"Reached limit for domain {domain}: {self.pages_per_domain} pages")
+                return False
+
+            return True
     
     async def apply_rate_limit(self, domain: str):
         """Apply rate limiting per domain"""
-        if self.request_delay > 0:
+        if self.request_delay <= 0:
+            return
+
+        # Serialize per domain so concurrent workers can't all read the same
+        # timestamp and proceed without delay; other domains are unaffected.
+        # Monotonic time is immune to wall-clock jumps.
+        lock = self._domain_locks.setdefault(domain, asyncio.Lock())
+        async with lock:
             last_time = self.last_request_time.get(domain, 0)
-            elapsed = time.time() - last_time
-            
+            elapsed = time.monotonic() - last_time
+
             if elapsed < self.request_delay:
                 await asyncio.sleep(self.request_delay - elapsed)
-            
-            self.last_request_time[domain] = time.time()
-    
-    def extract_urls(self, html: str, base_url: str) -> Set[str]:
-        with open('web_archiver.log', 'a') as log_file:
-            """Extract all URLs from HTML"""
-            urls = set()
-            try:
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Extract from links
-                for tag in soup.find_all(['a', 'area']):
-                    url = tag.get('href')
-                    if url:
-                        absolute_url = urljoin(base_url, url)
-                        if URLFilter.should_scrape(absolute_url, self.base_domain):
-                            urls.add(absolute_url)
-                            
-            except Exception as e:
-                logger.error(f"Error extracting URLs: {e}")
-                
-            return urls
+
+            self.last_request_time[domain] = time.monotonic()
     
     async def save_page_content(self, url: str, content: str, content_type: str) -> Optional[str]:
         """Save page content to disk"""
@@ -528,15 +749,12 @@ class WebScraper:
                     ext = '.xml'
                 filepath = f"{self.output_dir}/html/{url_hash}{ext}"
             
-            async with aiofiles.open(filepath, 'w', encoding='utf-8') as f:
-                await f.write(content)
-            
+            await asyncio.to_thread(_write_text, filepath, content)
+
             return filepath
             
         except Exception as e:
-            with open('web_archiver.log', 'a') as log_file:
-                logger.error(f"Error saving content for {url}: {e}")
-                log_file.write(f"Error saving content for {url}: {e}\n")
+            logger.error(f"Error saving content for {url}: {e}")
             return None
     
     async def process_url(self, session: aiohttp.ClientSession, url: str, depth: int):
@@ -558,181 +776,198 @@ class WebScraper:
         if not result:
             return
         
-        content, content_type, cookies = result
-        
+        content, content_type = result
+
         # Update counters
-        domain = urlparse(url).netloc
+        domain = _cached_urlparse(url).netloc
         async with self.stop_lock:
             self.pages_scraped_count += 1
             self.domain_counts[domain] = self.domain_counts.get(domain, 0) + 1
             if self.pages_scraped_count >= self.max_pages:
-                self.should_stop = True
-        
-        # Store cookies for this domain
-        if cookies:
-            self.domain_cookies[domain] = cookies
-        
+                self._signal_stop()
+
         # Update stats
-        self.stats.add_page(url, len(content))
+        self.stats.add_page(domain, len(content))
         
         # Process HTML content
+        new_urls = set()
         if 'html' in content_type:
-            # Rewrite URLs to point to local assets
-            content = await self.rewrite_html_urls(content, url, session)
+            # Rewrite URLs to point to local assets; link extraction happens
+            # in the same parse
+            content, new_urls = await self.rewrite_html_urls(content, url, session)
         
         # Save content
         filepath = await self.save_page_content(url, content, content_type)
         
-        # Store metadata in the database
-        database.insert_page(
-            run_id=self.run_id,
-            url=url,
-            content_type=content_type,
-            filepath=filepath,
-            depth=depth,
-            size=len(content),
-            domain=domain
+        # Record page metadata for the metadata.json dump
+        self.scraped_data[url] = {
+            'hash': URLFilter.get_url_hash(url),
+            'domain': canonical_domain(domain),
+            'timestamp': datetime.now().isoformat(),
+            'content_type': content_type,
+            'size': len(content),
+            'depth': depth,
+            'filepath': filepath
+        }
+
+        # Buffer metadata for the database; flushed in batches
+        self.page_buffer.append(
+            (url, content_type, filepath, depth, len(content), canonical_domain(domain))
         )
+        if len(self.page_buffer) >= self.page_flush_size:
+            await self.flush_page_buffer()
         
         # Log progress
         logger.info(f"Progress: {self.pages_scraped_count}/{self.max_pages} pages scraped, {len(self.asset_map)} assets downloaded")
         
-        # Extract and queue new URLs if HTML
-        if 'html' in content_type and not self.should_stop:
+        # Queue URLs extracted during the rewrite pass
+        if new_urls and not self.should_stop:
             # Check domain limit before adding more URLs from the same domain
-            domain = urlparse(url).netloc
+            domain = _cached_urlparse(url).netloc
             if self.domain_counts.get(domain, 0) < self.pages_per_domain:
-                new_urls = self.extract_urls(content, url)
                 for new_url in new_urls:
                     if new_url not in self.visited_urls and not self.should_stop:
-                        await self.queue.put((new_url, depth + 1))
+                        self._put_work((new_url, depth + 1))
     
+    async def flush_page_buffer(self):
+        """Flush buffered page metadata to the database in one batch."""
+        if not self.page_buffer:
+            return
+        rows, self.page_buffer = self.page_buffer, []
+        await db_async.insert_pages(self.run_id, rows)
+
     async def worker(self, session: aiohttp.ClientSession, pbar: tqdm):
-        """Worker to process URLs from queue"""
-        while not self.should_stop:
+        """Worker to process URLs from queue until cancelled"""
+        while True:
+            item = await self._get_work()
             try:
-                url, depth = await asyncio.wait_for(self.queue.get(), timeout=5)
-                
                 if self.should_stop:
-                    break
-                    
+                    continue
+
+                url, depth = item
                 await self.process_url(session, url, depth)
                 pbar.update(1)
-                with open('web_archiver.log', 'a') as log_file:
-                    log_file.write(f"#{self.pages_scraped_count}; {self.max_pages}; {len(self.asset_map)} \n")
+                # Machine-readable progress feed parsed by the dashboard
+                # (public/app.js): "#scraped; max; assets"
+                logger.info("#%d; %d; %d", self.pages_scraped_count,
+                            self.max_pages, len(self.asset_map))
                 pbar.set_description(f"Pages: {self.pages_scraped_count}/{self.max_pages}, Assets: {len(self.asset_map)}")
-                self.queue.task_done()
-                
-            except asyncio.TimeoutError:
-                if self.queue.empty():
-                    break
+
             except Exception as e:
-                with open('web_archiver.log', 'a') as log_file:
-                    logger.error(f"Worker error: {e}")
-                    log_file.write(f"Worker error: {e}\n")
+                logger.error(f"Worker error: {e}")
+            finally:
+                self._work_done()
     
     async def run(self):
-        with open('web_archiver.log', 'a') as log_file:
-            """Run the scraper"""
-            logger.info(f"Starting scraper for {self.start_url}")
-            log_file.write(f"Starting scraper for {self.start_url}\n")
-            logger.info(f"Limits: max_pages={self.max_pages}, pages_per_domain={self.pages_per_domain}")
-            log_file.write(f"Limits: max_pages={self.max_pages}, pages_per_domain={self.pages_per_domain}\n")
-            logger.info(f"Settings: max_depth={self.max_depth}, workers={self.max_workers}")
-            log_file.write(f"Settings: max_depth={self.max_depth}, workers={self.max_workers}\n")
-            
-            # Initialize session with cookie jar
-            timeout = aiohttp.ClientTimeout(total=60)
-            connector = aiohttp.TCPConnector(
-                limit=100, 
-                limit_per_host=30,
-                force_close=True
-            )
-            
-            # Use cookie jar for session
-            jar = aiohttp.CookieJar()
-            
-            async with aiohttp.ClientSession(
-                timeout=timeout, 
-                connector=connector,
-                cookie_jar=jar
-            ) as session:
-                
-                # Add start URL to queue
-                await self.queue.put((self.start_url, 0))
-                
-                # Create progress bar
-                with tqdm(
-                    desc=f"Scraping (0/{self.max_pages})", 
-                    unit="pages",
-                    total=self.max_pages
-                ) as pbar:
-                    # Start workers
-                    workers = [
-                        asyncio.create_task(self.worker(session, pbar))
-                        for _ in range(self.max_workers)
-                    ]
-                    
-                    # Monitoring task to check for completion
-                    async def monitor():
-                        while not self.should_stop:
-                            await asyncio.sleep(0.5)
-
-                        # Once stop is signaled, empty the queue
-                        while not self.queue.empty():
-                            self.queue.get_nowait()
-                            self.queue.task_done()
-
-                    monitor_task = asyncio.create_task(monitor())
-                    
-                    # Wait for all initial tasks to complete
-                    await self.queue.join()
-                    self.should_stop = True # Ensure stop is signaled
-                    
-                    # Cancel monitor and workers
-                    monitor_task.cancel()
-                    for worker in workers:
-                        worker.cancel()
-                    
-                    await asyncio.gather(*workers, return_exceptions=True)
-            
-            # Get final stats
-            final_stats = self.stats.get_stats()
-            
-            # Update run in the database
-            database.update_run(self.run_id, final_stats, self.domain_counts)
-            
-            # Log summary
-            logger.info("=" * 60)
-            log_file.write("=" * 60 + "\n")
-            logger.info("Scraping Summary:")
-            log_file.write("Scraping Summary:\n")
-            logger.info(f"  Pages scraped: {self.pages_scraped_count}/{self.max_pages}")
-            log_file.write(f"  Pages scraped: {self.pages_scraped_count}/{self.max_pages}\n")
-            logger.info(f"  Assets downloaded: {len(self.asset_map)}")
-            log_file.write(f"  Assets downloaded: {len(self.asset_map)}\n")
-            logger.info(f"  Failed assets: {len(self.failed_assets)}")
-            log_file.write(f"  Failed assets: {len(self.failed_assets)}\n")
-            logger.info(f"  Pages failed: {final_stats['pages_failed']}")
-            log_file.write(f"  Pages failed: {final_stats['pages_failed']}\n")
-            logger.info(f"  Data downloaded: {final_stats['bytes_downloaded']:,} bytes")
-            log_file.write(f"  Data downloaded: {final_stats['bytes_downloaded']:,} bytes\n")
-            logger.info(f"  Time elapsed: {final_stats['elapsed_seconds']:.2f} seconds")
-            log_file.write(f"  Time elapsed: {final_stats['elapsed_seconds']:.2f} seconds\n")
-            logger.info(f"  Pages/second: {final_stats['pages_per_second']:.2f}")
-            log_file.write(f"  Pages/second: {final_stats['pages_per_second']:.2f}\n")
-            logger.info(f"  Domains scraped: {final_stats['total_domains']}")
-            log_file.write(f"  Domains scraped: {final_stats['total_domains']}\n")
-            
-            if self.domain_counts:
-                logger.info("\nTop domains:")
-                log_file.write("\nTop domains:\n")
-                for domain, count in sorted(self.domain_counts.items(), 
-                                        key=lambda x: x[1], reverse=True)[:5]:
-                    logger.info(f"    {domain}: {count} pages")
-                    log_file.write(f"    {domain}: {count} pages\n")
-            
-            logger.info("=" * 60)
-            log_file.write("=" * 60 + "\n")
-            
-            return self.scraped_data
\ No newline at end of file
+        """Run the scraper"""
+        logger.info(f"Starting scraper for {self.start_url}")
+        logger.info(f"Limits: max_pages={self.max_pages}, pages_per_domain={self.pages_per_domain}")
+        logger.info(f"Settings: max_depth={self.max_depth}, workers={self.max_workers}")
+
+        # Initialize session with cookie jar. No force_close: keeping sockets
+        # (and TLS sessions) alive across requests to the same host avoids a
+        # fresh TCP+TLS handshake per request.
+        timeout = aiohttp.ClientTimeout(total=60)
+        connector = aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=30,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+
+        # Use cookie jar for session
+        jar = aiohttp.CookieJar()
+
+        async with aiohttp.ClientSession(
+            timeout=timeout,
+            connector=connector,
+            cookie_jar=jar
+        ) as session:
+
+            # robots.txt fetches ride the same connection pool as the crawl
+            if self.robots_checker:
+                self.robots_checker.session = session
+
+            # Add start URL to queue
+            self._put_work((self.start_url, 0))
+
+            # Create progress bar
+            with tqdm(
+                desc=f"Scraping (0/{self.max_pages})",
+                unit="pages",
+                total=self.max_pages
+            ) as pbar:
+                # Start workers
+                workers = [
+                    asyncio.create_task(self.worker(session, pbar))
+                    for _ in range(self.max_workers)
+                ]
+
+                # Run until either all queued work completes or a stop is
+                # signaled; both are event-driven, no polling coroutine
+                idle_task = asyncio.create_task(self._idle.wait())
+                stop_task = asyncio.create_task(self._stop_event.wait())
+                await asyncio.wait({idle_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                self._signal_stop()  # Ensure stop is signaled
+                idle_task.cancel()
+                stop_task.cancel()
+
+                # Cancel workers immediately rather than letting them keep
+                # pulling items whose results would be discarded
+                for worker in workers:
+                    worker.cancel()
+                self._drain_work()
+
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        # Flush any remaining buffered pages and persist the asset sidecar
+        await self.flush_page_buffer()
+        await self._save_asset_map()
+
+        # Get final stats
+        final_stats = self.stats.get_stats()
+
+        # Update run in the database
+        await db_async.update_run(self.run_id, final_stats, self.domain_counts)
+
+        # Write run metadata; the large collections stream to disk
+        # element-by-element instead of being serialized as one giant blob
+        await asyncio.to_thread(
+            save_json_streaming,
+            {
+                'run_id': self.run_id,
+                'start_url': self.start_url,
+                'completed_at': datetime.now().isoformat(),
+                'stats': final_stats
+            },
+            {
+                'pages': self.scraped_data,
+                'asset_map': self.asset_map,
+                'failed_assets': sorted(self.failed_assets)
+            },
+            f"{self.output_dir}/metadata.json"
+        )
+
+        # Log summary in one batched write instead of ~20 handler calls
+        lines = [
+            "=" * 60,
+            "Scraping Summary:",
+            f"  Pages scraped: {self.pages_scraped_count}/{self.max_pages}",
+            f"  Assets downloaded: {len(self.asset_map)}",
+            f"  Failed assets: {len(self.failed_assets)}",
+            f"  Pages failed: {final_stats['pages_failed']}",
+            f"  Data downloaded: {final_stats['bytes_downloaded']:,} bytes",
+            f"  Time elapsed: {final_stats['elapsed_seconds']:.2f} seconds",
+            f"  Pages/second: {final_stats['pages_per_second']:.2f}",
+            f"  Domains scraped: {final_stats['total_domains']}"
+        ]
+
+        if self.domain_counts:
+            lines.append("\nTop domains:")
+            for domain, count in heapq.nlargest(5, self.domain_counts.items(), key=itemgetter(1)):
+                lines.append(f"    {domain}: {count} pages")
+
+        lines.append("=" * 60)
+        logger.info("\n".join(lines))
+
+        return self.scraped_data
\ No newline at end of file
@@ -6,21 +6,160 @@ import re
 import json
 import asyncio
 import logging
+import sqlite3
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
 import aiohttp
 from aiohttp import web
-import aiofiles
 import subprocess
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv, dotenv_values
+from utils import URLFilter
 import database
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson parses and serializes several times faster than stdlib json;
+# optional, same as elsewhere in the project
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson iterates JSON incrementally; optional, used only for metadata
+# files too large to be worth materializing as one dict
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Above this size, stream metadata pages instead of caching the full parse
+_STREAM_THRESHOLD = 16 * 1024 * 1024
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _json_dumps(obj) -> str:
+    """dumps= hook for web.json_response on hot endpoints."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+def _env_bool(value: str) -> bool:
+    return value.lower() == 'true'
+
+def _write_env(path: str, env: Dict[str, str]):
+    """Rewrite a .env file in one pass, renamed into place atomically."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for key, value in env.items():
+            f.write(f"{key}={value}\n")
+    os.replace(tmp, path)
+
+def _tail(path: str, n: int = 50, block: int = 65536) -> List[str]:
+    """Last n lines of a file, reading only the final `block` bytes.
+
+    readlines()[-n:] pulls the whole log into memory; a long scrape's log
+    can reach gigabytes, all read just to keep 50 lines. Lines keep their
+    newline terminators, matching readlines(): the dashboard joins them
+    with '' and re-splits on newlines.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - block))
+        return f.read().decode('utf-8', 'replace').splitlines(keepends=True)[-n:]
+
+@lru_cache(maxsize=4)
+def _list_runs(dir_path: str, dir_mtime_ns: int) -> tuple:
+    """Run directory names, newest-first, memoized on the parent's mtime.
+
+    scandir classifies directories from the directory read itself, where
+    iterdir + Path.is_dir() costs a Path object and a stat per entry;
+    a new run bumps the parent mtime and refreshes the cache.
+    """
+    return tuple(sorted(
+        (entry.name for entry in os.scandir(dir_path)
+         if entry.is_dir(follow_symlinks=False) and entry.name.replace('_', '').isdigit()),
+        reverse=True))
+
+@lru_cache(maxsize=16)
+def _scan_archives(dir_path: str, dir_mtime_ns: int) -> List[Dict]:
+    """List archives newest-first, memoized on the directory's mtime.
+
+    One scandir pass reuses DirEntry's cached stat data, versus the old
+    glob plus two fresh stat() calls per file per request; adding or
+    removing an archive bumps the directory mtime and invalidates.
+    """
+    entries = [e for e in os.scandir(dir_path)
+               if e.name.endswith(('.tar.gz', '.tar.xz', '.tar.zst', '.tar.bz2'))]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    return [
+        {
+            'name': e.name,
+            'size': e.stat().st_size,
+            'created': datetime.fromtimestamp(e.stat().st_mtime).isoformat()
+        }
+        for e in entries
+    ]
+
+@lru_cache(maxsize=256)
+def _load_json_cached(path_str: str, mtime_ns: int) -> Dict:
+    """Parse a JSON file, memoized on (path, mtime).
+
+    The mtime key self-invalidates when a scrape rewrites the file, and
+    stale generations age out of the LRU. A dashboard polling the API
+    otherwise re-parses the same multi-MB metadata.json on every hit.
+    No locking needed: handlers all run on the one event-loop thread.
+    """
+    with open(path_str, 'rb') as f:
+        return _json_loads(f.read())
+
+@lru_cache(maxsize=64)
+def _pages_index_cached(path_str: str, mtime_ns: int) -> List[tuple]:
+    """Per-run page list with pre-lowercased url/domain match keys.
+
+    Built once per metadata generation, so the scan fallback compares
+    against ready-made lowercase strings instead of calling .lower()
+    on every url and domain for every query.
+    """
+    metadata = _load_json_cached(path_str, mtime_ns)
+    return [
+        (url, url.lower(), (page_data.get('domain') or '').lower(), page_data)
+        for url, page_data in metadata.get('pages', {}).items()
+    ]
+
 class WebArchiveServer:
+    # Input validators for path segments, compiled once; \Z rather than $
+    # so a trailing newline can't sneak past the match
+    _RUN_ID_RE = re.compile(r'[a-zA-Z0-9_]+\Z')
+    _HASH_RE = re.compile(r'[a-zA-Z0-9]+\Z')
+
+    # The dashboard polls /api/scrape/status continuously and the idle
+    # answer never changes; pre-encode it once. (A whole Response object
+    # can't be cached — aiohttp prepares each instance for one request.)
+    _IDLE_STATUS_BODY = b'{"status": "idle"}'
+
+    # (key, caster, default) triples driving get_scrape_config; one table
+    # instead of ten hand-written os.getenv-and-cast lines
+    _CONFIG_SCHEMA = (
+        ('START_URL', str, 'https://example.com'),
+        ('MAX_WORKERS', int, 10),
+        ('MAX_DEPTH', int, 3),
+        ('MAX_PAGES', int, 100),
+        ('PAGES_PER_DOMAIN', int, 50),
+        ('IMAGE_QUALITY', int, 85),
+        ('MAX_IMAGE_WIDTH', int, 1920),
+        ('COMPRESSION_LEVEL', int, 19),
+        ('SKIP_ASSETS', _env_bool, False),
+        ('RESPECT_ROBOTS_TXT', _env_bool, True),
+        ('REQUEST_DELAY', float, 0.5),
+    )
+
     def __init__(self, port=8080, scraped_data_dir='./scraped_data', archives_dir='./archives'):
         self.port = port
         self.scraped_data_dir = Path(scraped_data_dir)
@@ -28,6 +167,16 @@ class WebArchiveServer:
         self.app = web.Application()
         self.active_scrape = None
         self.scraped_data_dir.mkdir(exist_ok=True)
+        # Parse .env once; start_scrape re-applies it after config changes
+        load_dotenv()
+        # Resolved once: preview_page's traversal check compares against
+        # this instead of re-resolving the unchanging root per request
+        self._root_resolved = os.path.realpath(self.scraped_data_dir)
+        # FTS5 index over all runs' pages so /api/search is one indexed
+        # query instead of a substring scan of every metadata.json
+        self.search_db_path = str(self.scraped_data_dir / 'search.db')
+        self._search_db = self._init_search_db()
+        self._index_lock = asyncio.Lock()
         self.setup_routes()
         
     def setup_routes(self):
@@ -60,41 +209,181 @@ class WebArchiveServer:
     async def serve_index(self, request):
         """Serve the index.html file."""
         return web.FileResponse('public/index.html')
-        
+
+    @staticmethod
+    async def _load_metadata(path) -> Dict:
+        """Cached metadata load; only cache misses touch disk or decode."""
+        st = await asyncio.to_thread(os.stat, path)
+        return await asyncio.to_thread(_load_json_cached, str(path), st.st_mtime_ns)
+
+    async def _run_dir_names(self) -> tuple:
+        """Cached names of run directories under the data dir."""
+        st = await asyncio.to_thread(os.stat, self.scraped_data_dir)
+        return await asyncio.to_thread(
+            _list_runs, str(self.scraped_data_dir), st.st_mtime_ns)
+
+    @staticmethod
+    async def _load_pages_index(path) -> List[tuple]:
+        """Cached lowercase-keyed page index for the scan fallback."""
+        st = await asyncio.to_thread(os.stat, path)
+        return await asyncio.to_thread(_pages_index_cached, str(path), st.st_mtime_ns)
+
+    def _init_search_db(self):
+        """Open (or create) the FTS5 search index; None when unavailable."""
+        try:
+            db = sqlite3.connect(self.search_db_path, check_same_thread=False)
+            db.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5('
+                'run_id UNINDEXED, url, domain, hash UNINDEXED, '
+                'timestamp UNINDEXED, content_type UNINDEXED, size UNINDEXED)')
+            db.execute('CREATE TABLE IF NOT EXISTS indexed_runs (run_id TEXT PRIMARY KEY)')
+            db.commit()
+            return db
+        except sqlite3.OperationalError as e:
+            # e.g. sqlite built without FTS5: fall back to metadata scans
+            logger.warning(f"Search index unavailable ({e}); using metadata scans")
+            return None
+
+    def _index_run(self, run_id: str, metadata: Dict):
+        """Bulk-insert one finished run's pages in a single transaction."""
+        rows = [
+            (run_id, url, page.get('domain', ''),
+             page.get('hash') or self.get_url_hash(url),
+             page.get('timestamp', ''), page.get('content_type', ''),
+             page.get('size', 0))
+            for url, page in metadata.get('pages', {}).items()
+        ]
+        with self._search_db:
+            self._search_db.executemany(
+                'INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self._search_db.execute(
+                'INSERT OR REPLACE INTO indexed_runs VALUES (?)', (run_id,))
+        logger.info(f"Indexed {len(rows)} pages from run {run_id} for search")
+
+    async def refresh_search_index(self):
+        """Add any finished runs that aren't in the search index yet."""
+        if self._search_db is None or not self.scraped_data_dir.exists():
+            return
+        async with self._index_lock:
+            indexed = {row[0] for row in
+                       self._search_db.execute('SELECT run_id FROM indexed_runs')}
+            for run_name in await self._run_dir_names():
+                if run_name in indexed:
+                    continue
+                metadata_file = self.scraped_data_dir / run_name / 'metadata.json'
+                if not metadata_file.exists():
+                    continue
+                metadata = await self._load_metadata(metadata_file)
+                await asyncio.to_thread(self._index_run, run_name, metadata)
+
+    def _query_search_index(self, query: str, limit: int) -> List[Dict]:
+        # Quote the user's text so FTS5 operators can't break the query
+        match = '"' + query.replace('"', '""') + '"'
+        cursor = self._search_db.execute(
+            'SELECT run_id, url, domain, hash, timestamp, content_type, size '
+            'FROM pages WHERE pages MATCH ? LIMIT ?', (match, limit))
+        keys = ('run_id', 'url', 'domain', 'hash', 'timestamp', 'content_type', 'size')
+        return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    async def _stream_json(request, payload) -> web.StreamResponse:
+        """Send a large payload as chunked JSON.
+
+        web.json_response serializes through str and buffers the whole
+        body before writing; orjson emits bytes directly and the stream
+        response starts sending without the intermediate copy. Used for
+        run-sized payloads (details, stats), not small control responses.
+        """
+        if orjson is not None:
+            body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            body = json.dumps(payload, default=str).encode('utf-8')
+        resp = web.StreamResponse(headers={'Content-Type': 'application/json'})
+        await resp.prepare(request)
+        await resp.write(body)
+        await resp.write_eof()
+        return resp
+
+    def _search_result(self, run_id: str, url: str, page_data: Dict) -> Dict:
+        """One /api/search result row from a metadata page entry."""
+        return {
+            'run_id': run_id,
+            'url': url,
+            # Hash is computed at scrape time; only runs predating that
+            # field pay for one here
+            'hash': page_data.get('hash') or self.get_url_hash(url),
+            'domain': page_data.get('domain', ''),
+            'timestamp': page_data.get('timestamp', ''),
+            'content_type': page_data.get('content_type', ''),
+            'size': int(page_data.get('size', 0))
+        }
+
+    def _search_metadata_streaming(self, path: str, query: str,
+                                   run_id: str, limit: int) -> List[Dict]:
+        """Substring-scan a huge metadata.json without loading it whole.
+
+        ijson yields one (url, page) pair at a time, so RSS stays flat
+        and hitting the limit genuinely stops the parse mid-file.
+        """
+        matches = []
+        with open(path, 'rb') as f:
+            for url, page_data in ijson.kvitems(f, 'pages'):
+                if query in url.lower() or query in (page_data.get('domain') or '').lower():
+                    matches.append(self._search_result(run_id, url, page_data))
+                    if len(matches) >= limit:
+                        break
+        return matches
+
     async def global_search(self, request):
         """Search across all runs"""
         query = request.query.get('q', '').lower()
         limit = int(request.query.get('limit', 100))
-        
+
         if not query:
             return web.json_response({'results': []})
-        
+
         results = []
-        
+
+        if self._search_db is not None:
+            # Pick up runs created outside this server (python main.py)
+            # since the last refresh; cheap when there's nothing new, as
+            # the run-dir listing is mtime-memoized and indexed runs skip
+            await self.refresh_search_index()
+            # One indexed MATCH query replaces loading and substring-scanning
+            # every run's metadata.json per request
+            try:
+                results = await asyncio.to_thread(self._query_search_index, query, limit)
+                return web.json_response({
+                    'results': results,
+                    'total': len(results),
+                    'query': query
+                }, dumps=_json_dumps)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Search index query failed, scanning metadata: {e}")
+
         if self.scraped_data_dir.exists():
-            for run_dir in self.scraped_data_dir.iterdir():
-                if run_dir.is_dir() and run_dir.name.replace('_', '').isdigit():
-                    metadata_file = run_dir / 'metadata.json'
-                    if metadata_file.exists():
-                        with open(metadata_file, 'r') as f:
-                            metadata = json.load(f)
-                        
-                        # Search in pages
-                        for url, page_data in metadata.get('pages', {}).items():
-                            if query in url.lower() or query in page_data.get('domain', '').lower():
-                                results.append({
-                                    'run_id': run_dir.name,
-                                    'url': url,
-                                    'hash': self.get_url_hash(url),
-                                    'domain': page_data.get('domain', ''),
-                                    'timestamp': page_data.get('timestamp', ''),
-                                    'content_type': page_data.get('content_type', ''),
-                                    'size': page_data.get('size', 0)
-                                })
-                                
+            for run_name in await self._run_dir_names():
+                metadata_file = self.scraped_data_dir / run_name / 'metadata.json'
+                if metadata_file.exists():
+                    size = (await asyncio.to_thread(os.stat, metadata_file)).st_size
+                    if ijson is not None and size > _STREAM_THRESHOLD:
+                        # Huge run: stream page entries and stop at the
+                        # limit instead of materializing the whole dict
+                        results.extend(await asyncio.to_thread(
+                            self._search_metadata_streaming, str(metadata_file),
+                            query, run_name, limit - len(results)))
+                    else:
+                        pages_index = await self._load_pages_index(metadata_file)
+
+                        # Search against the precomputed lowercase keys
+                        for url, url_lower, domain_lower, page_data in pages_index:
+                            if query in url_lower or query in domain_lower:
+                                results.append(self._search_result(
+                                    run_name, url, page_data))
+
                                 if len(results) >= limit:
                                     break
-                
+
                 if len(results) >= limit:
                     break
         
@@ -102,40 +391,64 @@ class WebArchiveServer:
             'results': results[:limit],
             'total': len(results),
             'query': query
-        })
+        }, dumps=_json_dumps)
     
+    @staticmethod
+    def _build_preview(src: Path, dst: Path, base_path: str):
+        """Write dst as src with a <base> tag injected after <head>.
+
+        Works on bytes to skip the decode/encode round-trip, and renames
+        into place so a crash mid-write can't leave a torn preview.
+        """
+        data = src.read_bytes()
+        head = data.find(b'<head>')
+        if head != -1:
+            tag = f'<base href="{base_path}">'.encode()
+            insert_at = head + len(b'<head>')
+            data = data[:insert_at] + tag + data[insert_at:]
+        tmp = str(dst) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, dst)
+
     async def preview_page(self, request):
         """Preview page as rendered HTML"""
         run_id = request.match_info['run_id']
         page_hash = request.match_info['page_hash']
 
         # Sanitize inputs to prevent path traversal
-        if not re.match(r'^[a-zA-Z0-9_]+$', run_id) or not re.match(r'^[a-zA-Z0-9]+$', page_hash):
+        if not self._RUN_ID_RE.match(run_id) or not self._HASH_RE.match(page_hash):
             return web.Response(text="Invalid request parameters", status=400)
 
         run_dir = self.scraped_data_dir / run_id
-        
+
+        # One traversal check on the run directory, not one full resolve
+        # per extension tried: the sanitized run_id/page_hash character
+        # classes can't introduce separators or '..' below this point
+        run_real = await asyncio.to_thread(os.path.realpath, run_dir)
+        if os.path.commonpath([self._root_resolved, run_real]) != self._root_resolved:
+            return web.Response(text="Forbidden", status=403)
+
         # Try to find the HTML file
         for ext in ['.html', '.htm', '.txt']:
             html_file = run_dir / 'html' / f"{page_hash}{ext}"
 
-            # Security check to ensure the path is within the data directory
-            if not html_file.resolve().is_relative_to(self.scraped_data_dir.resolve()):
-                return web.Response(text="Forbidden", status=403)
-
             if html_file.exists():
-                async with aiofiles.open(html_file, 'r', encoding='utf-8') as f:
-                    content = await f.read()
-                
-                # Set base tag for relative URLs to work
-                if '<head>' in content:
-                    # Insert base tag to help with asset loading
+                # Patch the <base> tag into a cached sibling once per
+                # source generation, then let FileResponse send it via
+                # sendfile instead of piping the body through Python
+                preview_file = run_dir / 'html' / f"{page_hash}.preview.html"
+                src_stat = await asyncio.to_thread(os.stat, html_file)
+                try:
+                    fresh = (await asyncio.to_thread(os.stat, preview_file)
+                             ).st_mtime_ns >= src_stat.st_mtime_ns
+                except FileNotFoundError:
+                    fresh = False
+                if not fresh:
                     base_path = f"/scraped_data/{run_id}/"
-                    base_tag = f'<base href="{base_path}">'
-                    content = content.replace('<head>', f'<head>{base_tag}')
-                
-                # Return as HTML response for direct rendering
-                return web.Response(text=content, content_type='text/html')
+                    await asyncio.to_thread(
+                        self._build_preview, html_file, preview_file, base_path)
+                return web.FileResponse(preview_file)
         
         # If not found, return a proper 404 page
         error_html = """
@@ -185,20 +498,27 @@ class WebArchiveServer:
         try:
             data = await request.json()
             
-            # Update .env file with new configuration
+            # Update .env with the new configuration in one write:
+            # set_key re-parses and rewrites the whole file per key
             env_file = '.env'
-            for key, value in data.items():
-                if key in ['START_URL', 'MAX_WORKERS', 'MAX_DEPTH', 'MAX_PAGES', 
-                          'PAGES_PER_DOMAIN', 'IMAGE_QUALITY', 'MAX_IMAGE_WIDTH',
-                          'COMPRESSION_LEVEL', 'SKIP_ASSETS', 'RESPECT_ROBOTS_TXT', 
-                          'REQUEST_DELAY']:
-                    set_key(env_file, key, str(value))
+            allowed = {'START_URL', 'MAX_WORKERS', 'MAX_DEPTH', 'MAX_PAGES',
+                       'PAGES_PER_DOMAIN', 'IMAGE_QUALITY', 'MAX_IMAGE_WIDTH',
+                       'COMPRESSION_LEVEL', 'SKIP_ASSETS', 'RESPECT_ROBOTS_TXT',
+                       'REQUEST_DELAY'}
+            env = await asyncio.to_thread(dotenv_values, env_file)
+            env.update({key: str(value) for key, value in data.items()
+                        if key in allowed})
+            await asyncio.to_thread(_write_env, env_file, env)
+            # Reflect the new values in this process for get_scrape_config
+            await asyncio.to_thread(load_dotenv, env_file, override=True)
             
-            # Start the scraping process
+            # Start the scraping process. Output goes to DEVNULL: the
+            # scraper logs to web_archiver.log anyway, and a PIPE nobody
+            # drains deadlocks the child once the 64 KB buffer fills.
             self.active_scrape = await asyncio.create_subprocess_exec(
                 'python', 'main.py', '--non-interactive',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
             )
             # Start monitoring task
             asyncio.create_task(self.monitor_scrape())
@@ -220,28 +540,27 @@ class WebArchiveServer:
             await self.active_scrape.wait()
             self.active_scrape = None
             logger.info("Scraping process completed")
+            # Pick up the finished run's pages for /api/search
+            await self.refresh_search_index()
     
     async def get_scrape_status(self, request):
         """Get current scrape status"""
         if self.active_scrape:
-            # Try to read the latest log
+            # Tail the latest log without reading the whole file
             log_content = []
             try:
-                with open('web_archiver.log', 'r') as f:
-                    # Get last 50 lines
-                    log_content = f.readlines()[-50:]
-            except:
+                log_content = await asyncio.to_thread(_tail, 'web_archiver.log')
+            except FileNotFoundError:
                 pass
-            
+
             return web.json_response({
                 'status': 'running',
                 'pid': self.active_scrape.pid,
                 'log': log_content
             })
         
-        return web.json_response({
-            'status': 'idle'
-        })
+        return web.Response(body=self._IDLE_STATUS_BODY,
+                            content_type='application/json')
     
     async def stop_scrape(self, request):
         """Stop active scrape"""
@@ -260,27 +579,20 @@ class WebArchiveServer:
     
     async def get_scrape_config(self, request):
         """Get current scraping configuration"""
-        load_dotenv()
-        
         config = {
-            'START_URL': os.getenv('START_URL', 'https://example.com'),
-            'MAX_WORKERS': int(os.getenv('MAX_WORKERS', 10)),
-            'MAX_DEPTH': int(os.getenv('MAX_DEPTH', 3)),
-            'MAX_PAGES': int(os.getenv('MAX_PAGES', 100)),
-            'PAGES_PER_DOMAIN': int(os.getenv('PAGES_PER_DOMAIN', 50)),
-            'IMAGE_QUALITY': int(os.getenv('IMAGE_QUALITY', 85)),
-            'MAX_IMAGE_WIDTH': int(os.getenv('MAX_IMAGE_WIDTH', 1920)),
-            'COMPRESSION_LEVEL': int(os.getenv('COMPRESSION_LEVEL', 19)),
-            'SKIP_ASSETS': os.getenv('SKIP_ASSETS', 'false').lower() == 'true',
-            'RESPECT_ROBOTS_TXT': os.getenv('RESPECT_ROBOTS_TXT', 'true').lower() == 'true',
-            'REQUEST_DELAY': float(os.getenv('REQUEST_DELAY', 0.5))
+            key: caster(os.environ[key]) if key in os.environ else default
+            for key, caster, default in self._CONFIG_SCHEMA
         }
-        
         return web.json_response(config)
     
     async def get_runs(self, request):
-        """Get all scraping runs"""
-        runs = database.get_runs_from_db()
+        """Get all scraping runs; optional ?limit= and ?offset= page the list"""
+        limit = request.query.get('limit')
+        offset = int(request.query.get('offset', 0))
+        runs = database.get_runs_from_db(
+            limit=int(limit) if limit is not None else None,
+            offset=offset
+        )
         return web.json_response(runs)
     
     async def get_run_details(self, request):
@@ -290,16 +602,16 @@ class WebArchiveServer:
         if not run:
             return web.json_response({'error': 'Run not found'}, status=404)
         
-        # Check for compression report
+        # The report lives at one fixed path; no need to glob for it, and
+        # the mtime-keyed cache skips the parse until it is rewritten
         compression_report = None
-        for archive_file in self.archives_dir.glob('compression_report.json'):
-            with open(archive_file, 'r') as f:
-                report = json.load(f)
-                if run_id in report.get('source_directory', ''):
-                    compression_report = report
-                    break
+        report_path = self.archives_dir / 'compression_report.json'
+        if await asyncio.to_thread(report_path.exists):
+            report = await self._load_metadata(report_path)
+            if run_id in report.get('source_directory', ''):
+                compression_report = report
         
-        return web.json_response({
+        return await self._stream_json(request, {
             'id': run_id,
             'metadata': run,
             'compression_report': compression_report
@@ -318,7 +630,7 @@ class WebArchiveServer:
         pages, total = database.get_run_pages_from_db(run_id, page, per_page, search, domain_filter)
         
         for page_data in pages:
-            page_data['hash'] = self.get_url_hash(page_data['url'])
+            page_data['hash'] = page_data.get('hash') or self.get_url_hash(page_data['url'])
 
         return web.json_response({
             'pages': pages,
@@ -328,7 +640,7 @@ class WebArchiveServer:
                 'total': total,
                 'total_pages': (total + per_page - 1) // per_page
             }
-        })
+        }, dumps=_json_dumps)
     
     async def get_page_content(self, request):
         """Get content of a specific page"""
@@ -342,9 +654,8 @@ class WebArchiveServer:
             for ext in ['.html', '.css', '.js', '.json', '.txt']:
                 filepath = run_dir / subdir / f"{page_hash}{ext}"
                 if filepath.exists():
-                    async with aiofiles.open(filepath, 'r', encoding='utf-8') as f:
-                        content = await f.read()
-                    
+                    content = await asyncio.to_thread(filepath.read_text, encoding='utf-8')
+
                     return web.json_response({
                         'content': content,
                         'type': ext[1:],
@@ -365,43 +676,35 @@ class WebArchiveServer:
         
         pages, _ = database.get_run_pages_from_db(run_id, per_page=10000) # Get all pages
         
-        content_types = {}
-        depths = {}
-        
-        for page_data in pages:
-            ct = page_data.get('content_type', 'unknown')
-            ct_simple = ct.split(';')[0].strip()
-            content_types[ct_simple] = content_types.get(ct_simple, 0) + 1
-            
-            depth = page_data.get('depth', 0)
-            depths[str(depth)] = depths.get(str(depth), 0) + 1
-        
-        return web.json_response({
+        # Counter increments at C level, replacing the per-page
+        # get-then-store dict dance; partition avoids split's list build
+        content_types = Counter(
+            (page_data.get('content_type') or 'unknown').partition(';')[0].strip()
+            for page_data in pages)
+        depths = Counter(str(page_data.get('depth', 0)) for page_data in pages)
+
+        return await self._stream_json(request, {
             'basic_stats': stats,
             'domain_distribution': domain_counts,
-            'content_types': content_types,
-            'depth_distribution': depths,
+            'content_types': dict(content_types),
+            'depth_distribution': dict(depths),
             'top_domains': sorted(domain_counts.items(), key=lambda x: x[1], reverse=True)[:10]
         })
     
     async def get_archives(self, request):
         """Get all archives"""
         archives = []
-        
+
         if self.archives_dir.exists():
-            for archive_file in sorted(self.archives_dir.glob('*.tar.*'), reverse=True):
-                archives.append({
-                    'name': archive_file.name,
-                    'size': archive_file.stat().st_size,
-                    'created': datetime.fromtimestamp(archive_file.stat().st_mtime).isoformat()
-                })
-        
+            st = await asyncio.to_thread(os.stat, self.archives_dir)
+            archives = await asyncio.to_thread(
+                _scan_archives, str(self.archives_dir), st.st_mtime_ns)
+
         return web.json_response(archives)
     
     def get_url_hash(self, url):
-        """Generate hash for URL"""
-        import hashlib
-        return hashlib.md5(url.encode()).hexdigest()
+        """Generate hash for URL; must match the scraper's page filenames"""
+        return URLFilter.get_url_hash(url)
     
     async def start(self):
         """Start the server"""
@@ -409,7 +712,10 @@ class WebArchiveServer:
         await runner.setup()
         site = web.TCPSite(runner, 'localhost', self.port)
         await site.start()
-        
+
+        # Index any runs that finished while the server was down
+        await self.refresh_search_index()
+
         logger.info(f"Server started at http://localhost:{self.port}")
         logger.info("Press Ctrl+C to stop")
         
@@ -424,4 +730,11 @@ async def main():
     await server.start()
 
 if __name__ == '__main__':
+    # uvloop substantially raises aiohttp throughput; requirements pin it
+    # on non-Windows platforms, stock loop otherwise
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -3,7 +3,10 @@ import os
 import json
 import hashlib
 import time
-from urllib.parse import urljoin, urlparse, parse_qs
+from collections import Counter
+from functools import lru_cache
+from urllib.parse import urljoin
+from urllib.parse import urlparse as _urlparse
 from urllib.robotparser import RobotFileParser
 from pathlib import Path
 import logging
@@ -18,6 +21,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# urlparse is pure Python and allocates a SplitResult per call, yet the
+# crawl hits it with the same URLs across filtering, rate limiting, stats
+# and robots checks. Rebinding the name memoizes every caller in one go;
+# other modules import this cached version so they share the cache.
+urlparse = lru_cache(maxsize=8192)(_urlparse)
+
+# URL hashes only name files on disk, so a fast non-cryptographic digest
+# beats md5; blake2b is the stdlib fallback when xxhash is missing
+try:
+    import xxhash
+
+    def _url_digest(url: str) -> str:
+        return xxhash.xxh3_64_hexdigest(url)
+except ImportError:
+    def _url_digest(url: str) -> str:
+        return hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+
+# Hyperscan scans all exclude patterns simultaneously as one DFA at
+# multi-GB/s; purely optional, the compiled re union remains the fallback
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+def _compile_hyperscan(patterns: List[str]):
+    """Compile patterns into a Hyperscan database plus scratch space.
+
+    Returns (None, None) when the binding is missing or a pattern isn't
+    supported by the DFA engine, in which case callers use the re fallback.
+    """
+    if hyperscan is None:
+        return None, None
+    try:
+        db = hyperscan.Database()
+        db.compile(expressions=[p.encode() for p in patterns],
+                   flags=[hyperscan.HS_FLAG_CASELESS] * len(patterns))
+        return db, hyperscan.Scratch(db)
+    except Exception as e:
+        logger.warning(f"Hyperscan unavailable, falling back to re: {e}")
+        return None, None
+
+@lru_cache(maxsize=4)
+def _base_netloc(base_domain: str) -> str:
+    """The crawl's base domain is constant; parse it once, not per link."""
+    return urlparse(base_domain).netloc
+
 class URLFilter:
     """Filter and validate URLs"""
     
@@ -33,124 +82,218 @@ class URLFilter:
         r'javascript:',
         r'#$'
     ]
-    
+
+    # One alternation compiled once: a single C-level scan per URL instead
+    # of one re.search dispatch per pattern
+    _EXCLUDE_RE = re.compile('|'.join(f'(?:{p})' for p in EXCLUDE_PATTERNS), re.IGNORECASE)
+
+    # Hyperscan DFA over the same patterns, when the binding is installed
+    _HS_DB, _HS_SCRATCH = _compile_hyperscan(EXCLUDE_PATTERNS)
+
     # Don't exclude downloads anymore since we want to capture full sites
-    DOWNLOAD_EXTENSIONS = {
-        '.pdf', '.zip', '.exe', '.dmg', '.msi', 
+    DOWNLOAD_EXTENSIONS = frozenset({
+        '.pdf', '.zip', '.exe', '.dmg', '.msi',
         '.tar.gz', '.rar', '.doc', '.docx', '.xls', '.xlsx'
-    }
-    
+    })
+
     # File extensions to process
-    ALLOWED_EXTENSIONS = {
-        '.html', '.htm', '.php', '.asp', '.aspx', 
+    ALLOWED_EXTENSIONS = frozenset({
+        '.html', '.htm', '.php', '.asp', '.aspx',
         '.jsp', '.css', '.js', '.json', '.xml', '.txt', ''
-    }
-    
-    IMAGE_EXTENSIONS = {
-        '.jpg', '.jpeg', '.png', '.gif', '.webp', 
+    })
+
+    IMAGE_EXTENSIONS = frozenset({
+        '.jpg', '.jpeg', '.png', '.gif', '.webp',
         '.svg', '.ico', '.bmp', '.avif', '.webm'
+    })
+
+    # Flattened suffix -> asset-type table: one dict probe in is_asset_url
+    # instead of a chain of set-membership branches
+    _EXT_TO_TYPE = {
+        '.css': 'css',
+        '.js': 'js', '.mjs': 'js',
+        **{ext: 'font' for ext in ('.woff', '.woff2', '.ttf', '.eot', '.otf')},
+        **{ext: 'media' for ext in ('.mp4', '.webm', '.ogg', '.mp3', '.wav')},
+        # Last so .webm keeps classifying as image, as the old branch order did
+        **{ext: 'image' for ext in IMAGE_EXTENSIONS},
     }
-    
-    @classmethod
-    def should_scrape(cls, url: str, base_domain: str) -> bool:
+
+    # The verdict for a URL is pure and the same links recur on page after
+    # page, so memoizing collapses the hot path to one cache probe — the
+    # dependency-light alternative to compiling the filter out of Python.
+    @staticmethod
+    @lru_cache(maxsize=1 << 16)
+    def should_scrape(url: str, base_domain: str) -> bool:
         """Check if URL should be scraped"""
         try:
             parsed = urlparse(url)
-            base_parsed = urlparse(base_domain)
-            
+
             # Check if same domain
-            if parsed.netloc != base_parsed.netloc:
+            if parsed.netloc != _base_netloc(base_domain):
                 return False
-            
+
             # Get file extension
             path = parsed.path.lower()
             ext = os.path.splitext(path)[1]
-            
+
             # Skip download files
-            if ext in cls.DOWNLOAD_EXTENSIONS:
+            if ext in URLFilter.DOWNLOAD_EXTENSIONS:
                 return False
-            
-            # Check exclude patterns
-            for pattern in cls.EXCLUDE_PATTERNS:
-                if re.search(pattern, url, re.IGNORECASE):
-                    return False
-            
-            # Check query parameters for download/login indicators
-            query_params = parse_qs(parsed.query)
-            exclude_params = {'download', 'login', 'logout', 'signin', 'signup'}
-            if any(param in query_params for param in exclude_params):
+
+            # Query-string download/login indicators: a substring scan over
+            # the raw query, skipping the dict parse_qs used to build
+            # Anchor each marker to a parameter boundary so names that
+            # merely end in one (?redownload=1, ?autologin=true) still pass
+            query = parsed.query
+            if query:
+                for marker in ('download=', 'login=', 'logout=',
+                               'signin=', 'signup='):
+                    if query.startswith(marker) or ('&' + marker) in query:
+                        return False
+
+            # Exclude-pattern scan goes last; it dominates the cost of
+            # this function, so every cheaper check gets to exit first
+            if URLFilter._matches_exclude(url):
                 return False
-            
+
             return True
-            
+
         except Exception as e:
             logger.error(f"Error filtering URL {url}: {e}")
             return False
     
-    @classmethod
-    def get_url_hash(cls, url: str) -> str:
-        """Generate hash for URL for storage"""
-        return hashlib.md5(url.encode()).hexdigest()
+    @staticmethod
+    def _matches_exclude(url: str) -> bool:
+        """True if any exclude pattern matches; Hyperscan when available."""
+        if URLFilter._HS_DB is not None:
+            hit = []
+
+            def _on_match(*_args):
+                hit.append(True)
+                return 1  # stop scanning at the first match
+
+            try:
+                URLFilter._HS_DB.scan(url.encode(), match_event_handler=_on_match,
+                                      scratch=URLFilter._HS_SCRATCH)
+            except hyperscan.ScanTerminated:
+                return True
+            return bool(hit)
+        return URLFilter._EXCLUDE_RE.search(url) is not None
+
+    # Generate hash for URL for storage; plain staticmethod avoids the
+    # classmethod wrapper on a very hot call
+    get_url_hash = staticmethod(_url_digest)
     
     @classmethod
-    def is_asset_url(cls, url: str) -> str:
+    def is_asset_url(cls, url: str) -> Optional[str]:
         """Determine if URL is an asset and return its type"""
-        parsed = urlparse(url)
-        path = parsed.path.lower()
-        ext = os.path.splitext(path)[1]
-        
-        if ext in cls.IMAGE_EXTENSIONS:
-            return 'image'
-        elif ext == '.css':
-            return 'css'
-        elif ext in ['.js', '.mjs']:
-            return 'js'
-        elif ext in ['.woff', '.woff2', '.ttf', '.eot', '.otf']:
-            return 'font'
-        elif ext in ['.mp4', '.webm', '.ogg', '.mp3', '.wav']:
-            return 'media'
-        
-        return None
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        return cls._EXT_TO_TYPE.get(ext)
 
 class RobotsChecker:
     """Check robots.txt compliance"""
-    
-    def __init__(self):
-        self.robots_cache = {}
-        
+
+    _FETCH_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+    def __init__(self, session: Optional['aiohttp.ClientSession'] = None,
+                 cache_path: Optional[str] = None):
+        # The scraper hands over its pooled session so robots.txt fetches
+        # reuse its keep-alive connections instead of opening a fresh
+        # ClientSession (new connector, new DNS lookup) per domain.
+        self.session = session
+        # base_url -> RobotFileParser, or None for "no robots.txt, allow all"
+        # so missing files aren't re-fetched for every URL on the domain
+        self.robots_cache: Dict[str, Optional[RobotFileParser]] = {}
+        # Coroutines racing on the same uncached domain wait on one fetch
+        self._inflight: Dict[str, asyncio.Event] = {}
+        # Optional on-disk cache of {etag, last_modified, body} per base_url
+        # so repeat runs send conditional GETs and 304s cost no payload
+        self.cache_path = cache_path
+        self._disk_cache: Dict[str, Dict] = {}
+        if cache_path:
+            try:
+                self._disk_cache = load_json(cache_path)
+            except (ValueError, OSError) as e:
+                # A torn cache just means re-fetching robots.txt once;
+                # never worth failing startup over
+                logger.warning(f"Ignoring unreadable robots cache {cache_path}: {e}")
+
     async def can_fetch(self, url: str, user_agent: str = '*') -> bool:
         """Check if URL can be fetched according to robots.txt"""
         try:
             parsed = urlparse(url)
             base_url = f"{parsed.scheme}://{parsed.netloc}"
-            
-            if base_url not in self.robots_cache:
-                robots_url = f"{base_url}/robots.txt"
-                rp = RobotFileParser()
-                rp.set_url(robots_url)
-                
-                # Try to read robots.txt
+
+            while base_url not in self.robots_cache:
+                pending = self._inflight.get(base_url)
+                if pending is not None:
+                    await pending.wait()
+                    continue
+                self._inflight[base_url] = asyncio.Event()
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(robots_url, timeout=5) as response:
-                            if response.status == 200:
-                                content = await response.text()
-                                rp.parse(content.splitlines())
-                            else:
-                                # No robots.txt, allow all
-                                return True
-                except:
-                    # Error fetching robots.txt, allow by default
-                    return True
-                    
-                self.robots_cache[base_url] = rp
-            
-            return self.robots_cache[base_url].can_fetch(user_agent, url)
-            
+                    self.robots_cache[base_url] = await self._fetch_robots(base_url)
+                finally:
+                    self._inflight.pop(base_url).set()
+
+            rp = self.robots_cache[base_url]
+            if rp is None:
+                return True
+            return rp.can_fetch(user_agent, url)
+
         except Exception as e:
             logger.warning(f"Error checking robots.txt for {url}: {e}")
             return True  # Allow by default on error
 
+    async def _fetch_robots(self, base_url: str) -> Optional[RobotFileParser]:
+        """Fetch and parse one robots.txt; None means allow everything."""
+        robots_url = f"{base_url}/robots.txt"
+        cached = self._disk_cache.get(base_url)
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            if self.session is not None:
+                response = await self.session.get(
+                    robots_url, headers=headers, timeout=self._FETCH_TIMEOUT)
+                return await self._handle_response(base_url, robots_url, response, cached)
+            # No shared session yet (standalone use): short-lived fallback
+            async with aiohttp.ClientSession(timeout=self._FETCH_TIMEOUT) as session:
+                response = await session.get(robots_url, headers=headers)
+                return await self._handle_response(base_url, robots_url, response, cached)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # Unreachable: fall back to the last known copy, else allow all
+            if cached:
+                return self._parse_body(robots_url, cached.get('body', ''))
+            return None
+
+    async def _handle_response(self, base_url: str, robots_url: str,
+                               response, cached: Optional[Dict]) -> Optional[RobotFileParser]:
+        async with response:
+            if response.status == 304 and cached is not None:
+                # Not modified: reparse the stored body, no payload transferred
+                return self._parse_body(robots_url, cached.get('body', ''))
+            if response.status != 200:
+                return None
+            content = await response.text()
+            self._disk_cache[base_url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'body': content,
+            }
+        if self.cache_path:
+            await asyncio.to_thread(save_json_atomic, dict(self._disk_cache), self.cache_path)
+        return self._parse_body(robots_url, content)
+
+    @staticmethod
+    def _parse_body(robots_url: str, content: str) -> RobotFileParser:
+        rp = RobotFileParser()
+        rp.set_url(robots_url)
+        rp.parse(content.splitlines())
+        return rp
+
 class ScraperStats:
     """Track scraper statistics"""
     
@@ -159,16 +302,18 @@ class ScraperStats:
         self.pages_scraped = 0
         self.pages_failed = 0
         self.bytes_downloaded = 0
-        self.domain_counts = {}
-        
-    def add_page(self, url: str, size: int):
-        """Add a successfully scraped page"""
+        self.domain_counts = Counter()
+
+    def add_page(self, domain: str, size: int):
+        """Add a successfully scraped page.
+
+        Takes the already-parsed netloc: every caller has it in hand, so
+        re-running urlparse here was pure duplicated work.
+        """
         self.pages_scraped += 1
         self.bytes_downloaded += size
-        
-        domain = urlparse(url).netloc
-        self.domain_counts[domain] = self.domain_counts.get(domain, 0) + 1
-        
+        self.domain_counts[domain] += 1
+
     def add_failed(self):
         """Add a failed page"""
         self.pages_failed += 1
@@ -183,23 +328,106 @@ class ScraperStats:
             'bytes_downloaded': self.bytes_downloaded,
             'elapsed_seconds': elapsed,
             'pages_per_second': self.pages_scraped / elapsed if elapsed > 0 else 0,
-            'domain_counts': self.domain_counts,
+            'domain_counts': dict(self.domain_counts),
             'total_domains': len(self.domain_counts)
         }
 
+@lru_cache(maxsize=1 << 16)
+def canonical_domain(netloc: str) -> str:
+    """Normalize a netloc for storage so DB keys on (run_id, domain) are stable."""
+    domain = netloc.lower().rstrip('.')
+    if ':' in domain:
+        host, _, port = domain.rpartition(':')
+        if port in ('80', '443'):
+            domain = host
+    return domain
+
 def ensure_directories(*dirs):
     """Ensure directories exist"""
     for directory in dirs:
         Path(directory).mkdir(parents=True, exist_ok=True)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def save_json(data: dict, filepath: str):
     """Save data to JSON file"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def save_json_atomic(data: dict, filepath: str):
+    """Save JSON via a temp sibling and rename into place.
+
+    For files that are rewritten repeatedly while being read back on the
+    next run (resume sidecars, caches): a crash mid-write can't leave a
+    torn file behind.
+    """
+    tmp = f"{filepath}.tmp"
+    save_json(data, tmp)
+    os.replace(tmp, filepath)
+
+def save_json_streaming(header: dict, collections: Dict[str, object], filepath: str):
+    """Save JSON with large collections streamed element-by-element.
+
+    The header fields are written first, then each entry in `collections`
+    is emitted as a JSON object (if it has .items()) or array, one element
+    at a time — so a multi-hundred-MB metadata dump never has to exist as
+    a single in-memory dict or bytes buffer.
+    """
+    if orjson is not None:
+        dumps = orjson.dumps
+    else:
+        def dumps(obj):
+            return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    with open(filepath, 'wb') as f:
+        head = dumps(header)
+        if head == b'{}':
+            f.write(b'{')
+            need_comma = False
+        else:
+            f.write(head[:-1])  # keep the object open
+            need_comma = True
+
+        for key, value in collections.items():
+            if need_comma:
+                f.write(b',')
+            need_comma = True
+            f.write(dumps(key) + b':')
+
+            if hasattr(value, 'items'):
+                f.write(b'{')
+                first = True
+                for k, v in value.items():
+                    if not first:
+                        f.write(b',')
+                    first = False
+                    f.write(dumps(k) + b':' + dumps(v))
+                f.write(b'}')
+            else:
+                f.write(b'[')
+                first = True
+                for item in value:
+                    if not first:
+                        f.write(b',')
+                    first = False
+                    f.write(dumps(item))
+                f.write(b']')
+
+        f.write(b'}')
 
 def load_json(filepath: str) -> dict:
     """Load data from JSON file"""
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
\ No newline at end of file
+    if not os.path.exists(filepath):
+        return {}
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
\ No newline at end of file